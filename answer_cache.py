@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Süresi dolan satırlar en fazla bu aralıkla, bir put sırasında tablodan silinir (saniye)
+PURGE_INTERVAL = 60
+
+# Normalize soru + belge sürümü + model kimliğinden önbellek anahtarı üret
+def answer_cache_key(normalized_question, document_key, model_id, mode):
+    raw = "\n".join([model_id, mode, document_key, normalized_question])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+# "Tüm dosyalar" kapsamının belge anahtarı: indekslenmiş içerik özetlerinin kümesinden üretilir
+def all_documents_key(content_hashes):
+    digest = hashlib.sha256("\n".join(sorted(content_hashes)).encode('utf-8')).hexdigest()
+    return f"all:{digest}"
+
+# Cevaplar için kalıcı önbellek: SQLite tablosu + süreli (TTL) bellek içi LRU
+# storage: storage.Storage (answer_cache tablosu şema göçleriyle oluşturulur)
+class AnswerCache:
+    def __init__(self, storage, max_entries, ttl_seconds, purge_interval=PURGE_INTERVAL):
+        self.storage = storage
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._entries = OrderedDict()  # anahtar -> (son geçerlilik zamanı, cevap)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.purged = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        with self.storage.connection() as conn:
+            row = conn.execute(
+                'SELECT payload, created_at FROM answer_cache WHERE key = ? AND created_at > ?',
+                (key, now - self.ttl)
+            ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        payload = json.loads(row[0])
+        self._remember(key, payload, row[1] + self.ttl)
+        with self._lock:
+            self.disk_hits += 1
+        return payload
+
+    # Yazarken, son temizlikten bu yana aralık geçtiyse süresi dolan satırlar da aynı işlemde silinir
+    def put(self, key, payload):
+        now = time.time()
+        with self._lock:
+            purge = now - self._last_purge >= self.purge_interval
+            if purge:
+                self._last_purge = now
+        with self.storage.connection() as conn:
+            if purge:
+                deleted = conn.execute('DELETE FROM answer_cache WHERE created_at <= ?', (now - self.ttl,)).rowcount
+            conn.execute(
+                'INSERT OR REPLACE INTO answer_cache (key, payload, created_at) VALUES (?, ?, ?)',
+                (key, json.dumps(payload, ensure_ascii=False), now)
+            )
+        if purge and deleted:
+            with self._lock:
+                self.purged += deleted
+        self._remember(key, payload, now + self.ttl)
+
+    def _remember(self, key, payload, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # /clear sonrasında tüm cevapları geçersiz kıl
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self.storage.connection() as conn:
+            conn.execute('DELETE FROM answer_cache')
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'entries_in_memory': len(self._entries),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'expired_deleted': self.purged,
+                'hit_ratio': round(hits / total, 3) if total else 0
+            }
@@ -1,92 +1,248 @@
-from flask import Flask, request, jsonify, render_template, g, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, g, send_from_directory
+import json
 import os
 import sqlite3
 import time
 import glob
+from bisect import bisect_right
 import traceback
-from datetime import datetime
-import shutil
+from concurrent.futures import FIRST_COMPLETED, wait
 from werkzeug.utils import secure_filename
-# BERT için gerekli kütüphaneleri ekleyelim
-from transformers import BertTokenizer, BertForQuestionAnswering
-import torch
+# transformers/torch, PyPDF2 ve docx ağır kütüphaneler; ilk kullanımda yüklenir
+from models import ModelRegistry, STATE_FAILED, STATE_IDLE, STATE_LOADING, STATE_READY
+from qa import DocumentEncoder, TOKENIZER_LOCK, answer_passages, encode_document, prepare_windows, select_answer
+from documents import file_extension
+from text_cache import TextCache, save_stream_sha256
+from ingest import IngestionQueue, STATUS_QUEUED, STATUS_INDEXED, STATUS_FAILED
+from retrieval import VectorIndex
+from scheduler import InferenceScheduler
+from answer_cache import AnswerCache, all_documents_key, answer_cache_key
+from lexical import KnownAnswers, LexicalIndex, fuse
+from metrics import METRICS, process_memory, timed
+from storage import Storage
 
 # Uygulama yapılandırması
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['DATABASE'] = 'database.db'
+app.config['DATABASE_POOL_SIZE'] = 16  # en fazla açık SQLite bağlantısı (istekler ve ingestion paylaşır)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'doc', 'docx', 'txt'}
+app.config['TEXT_CACHE_FOLDER'] = os.path.join('cache', 'text')
+app.config['TEXT_CACHE_MAX_MEMORY'] = 256 * 1024 * 1024  # 256MB
+app.config['INGEST_WORKERS'] = int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 2))
+app.config['INGEST_PAGES_PER_TASK'] = 50
+# Bir PDF için aynı anda çıkarılan/bellekte tutulan en fazla sayfa sayısı
+app.config['INGEST_MAX_INFLIGHT_PAGES'] = 256
+# Soru cevaplama: 'retrieval' yalnızca en benzer parçaları okur, 'document' tüm belgeyi
+# kayan pencerelerle tarar, 'snippet' BM25 ile seçilen iki parçayı (yoksa ilk ~2000 karakteri) kullanır
+app.config['QA_MODEL_NAME'] = os.environ.get('QA_MODEL_NAME', 'bert-base-uncased')
+app.config['QA_MODE'] = 'retrieval'
+QA_MODES = ('retrieval', 'document', 'snippet')
+# Çıkarım arka ucu: 'pytorch' (float32), 'quantized' (dinamik int8) ya da 'onnx' (ONNX Runtime)
+app.config['QA_BACKEND'] = os.environ.get('QA_BACKEND', 'pytorch')
+app.config['QA_NUM_THREADS'] = int(os.environ.get('QA_NUM_THREADS', 0)) or None  # intra-op iş parçacığı sayısı
+app.config['ONNX_EXPORT_FOLDER'] = os.path.join('cache', 'onnx')
+app.config['MODEL_LOAD_TIMEOUT'] = 120  # saniye; model yüklenirken gelen sorular en fazla bu kadar bekler
+app.config['ANSWER_CACHE_SIZE'] = 1024  # bellekte tutulan cevap sayısı
+app.config['ANSWER_CACHE_TTL'] = 24 * 60 * 60  # saniye
+app.config['QA_MAX_SEQ_LEN'] = 384
+app.config['QA_DOC_STRIDE'] = 128
+# Çıkarım zamanlayıcısı: en fazla INFERENCE_MAX_WAIT_MS bekleyip INFERENCE_MAX_BATCH_SIZE pencereyi birlikte çalıştırır
+app.config['INFERENCE_MAX_BATCH_SIZE'] = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 32))
+app.config['INFERENCE_MAX_WAIT_MS'] = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5))
+app.config['QA_MAX_ANSWER_TOKENS'] = 30
+app.config['QA_ENCODING_CACHE_SIZE'] = 8
+app.config['RETRIEVAL_FOLDER'] = os.path.join('cache', 'chroma')
+app.config['EMBEDDING_MODEL_NAME'] = os.environ.get('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+app.config['EMBEDDING_BATCH_SIZE'] = 64
+app.config['CHUNK_SIZE'] = 1000  # karakter
+app.config['CHUNK_OVERLAP'] = 200
+app.config['RETRIEVAL_TOP_K'] = 4
+# /files sayfalama ve /files/events değişiklik akışı
+app.config['FILES_PAGE_MAX'] = 500
+app.config['FILES_EVENTS_POLL_INTERVAL'] = 0.5  # saniye; değişiklik numarası tek satırdan okunur
+app.config['FILES_EVENTS_HEARTBEAT'] = 15  # saniye
+app.config['FILES_EVENTS_MAX_SECONDS'] = 300  # bağlantı bu süreden sonra kapanır, istemci yeniden bağlanır
+app.config['FILES_EVENTS_RETRY_MS'] = 2000
+app.config['ASK_BATCH_MAX_QUESTIONS'] = 256  # /ask/batch isteği başına en fazla soru
+app.config['ASK_BATCH_IN_FLIGHT'] = 8  # /ask/batch'te pencereleri aynı anda kuyrukta olan soru sayısı
+app.config['LEXICAL_CACHE_SIZE'] = 32  # bellekte tutulan BM25 indeksi (belge) sayısı
 
-# BERT modelini başlat
-print("BERT modeli yükleniyor...")
-try:
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-    model = BertForQuestionAnswering.from_pretrained('bert-base-uncased')
-    print("BERT modeli yüklendi")
-except Exception as e:
-    print(f"BERT model yükleme hatası: {str(e)}")
-    traceback.print_exc()
-    # Hata durumunda boş değerler ata, ama uygulamanın çalışmasını engelleme
-    tokenizer = None
-    model = None
+# Çıkarılan metin önbelleği (her yüklemede bir kez ayrıştırılır)
+text_cache = TextCache(app.config['TEXT_CACHE_FOLDER'], app.config['TEXT_CACHE_MAX_MEMORY'])
+
+# Belge tokenizasyonları (soru başına tekrar tokenize edilmez)
+document_encoder = DocumentEncoder(app.config['QA_ENCODING_CACHE_SIZE'])
+
+# Parça gömmeleri için kalıcı vektör indeksi
+vector_index = VectorIndex(
+    app.config['RETRIEVAL_FOLDER'],
+    app.config['EMBEDDING_MODEL_NAME'],
+    app.config['EMBEDDING_BATCH_SIZE'],
+    app.config['CHUNK_SIZE'],
+    app.config['CHUNK_OVERLAP']
+)
+
+# SQLite erişimi: iş parçacığı başına bağlantı, WAL; şema her giriş noktasında (python app.py,
+# WSGI sunucusu, benchmark betikleri) içe aktarma sırasında oluşturulur ve güncellenir
+storage = Storage(app.config['DATABASE'], app.config['DATABASE_POOL_SIZE'])
+storage.migrate()
+
+# Belge başına BM25 ters indeksi (files ile aynı veritabanında saklanır)
+lexical_index = LexicalIndex(storage, app.config['LEXICAL_CACHE_SIZE'])
+
+# Normalize soru + belge sürümü + model kimliğine göre cevap önbelleği
+answer_cache = AnswerCache(storage, app.config['ANSWER_CACHE_SIZE'], app.config['ANSWER_CACHE_TTL'])
+
+# Arka plan işleme kuyruğu (metin çıkarma ve indeksleme istek iş parçacığını bloklamaz)
+ingestion = IngestionQueue(
+    storage,
+    app.config['UPLOAD_FOLDER'],
+    text_cache,
+    vector_index,
+    lexical_index,
+    app.config['INGEST_WORKERS'],
+    app.config['INGEST_PAGES_PER_TASK'],
+    app.config['INGEST_MAX_INFLIGHT_PAGES']
+)
+
+# BERT modeli açılışı bloklamadan arka planda yüklenir
+models = ModelRegistry(
+    app.config['QA_MODEL_NAME'],
+    app.config['QA_BACKEND'],
+    app.config['ONNX_EXPORT_FOLDER'],
+    app.config['QA_NUM_THREADS']
+)
+
+# Tüm ileri geçişler tek bir zamanlayıcı iş parçacığında, gruplar halinde yapılır
+scheduler = InferenceScheduler(
+    models,
+    app.config['INFERENCE_MAX_BATCH_SIZE'],
+    app.config['INFERENCE_MAX_WAIT_MS']
+)
+
+# Alice in Wonderland için bilinen soruların hazır cevapları
+KNOWN_QUESTIONS = {
+    "alice kimdir?": "Alice, 'Alice Harikalar Diyarında' adlı hikayenin ana karakteridir. Meraklı ve maceracı bir kız çocuğudur. Beyaz Tavşan'ı takip ederek Harikalar Diyarı'na düşer ve orada birçok fantastik karakter ve olayla karşılaşır.",
+    "beyaz tavşan nedir?": "Beyaz Tavşan, Alice Harikalar Diyarında kitabındaki önemli bir karakterdir. Ceket giymiş, saat taşıyan konuşan bir tavşandır. Hikayenin başında \"Geç kaldım, geç kaldım!\" diyerek koşarken Alice'in dikkatini çeker ve Alice'in onu takip ederek Harikalar Diyarı'na düşmesine neden olur.",
+    "harikalar diyarı nedir?": "Harikalar Diyarı, Lewis Carroll'ın yazdığı 'Alice Harikalar Diyarında' kitabındaki fantastik bir yerdir. Konuşan hayvanlar, canlı oyun kartları, mantıksız kuralları olan çay partileri gibi birçok tuhaf ve olağanüstü olayın gerçekleştiği sürreal bir dünyadır.",
+    "cheshire kedisi kimdir?": "Cheshire Kedisi, Alice Harikalar Diyarında'daki en ikonik karakterlerden biridir. Görünmez olabilen ve sadece sırıtışı görünür şekilde kalabilen gizemli bir kedidir. Alice'e sık sık bilmeceli tavsiyeler verir ve Harikalar Diyarı'nın tuhaf mantığını temsil eder.",
+    "çılgın şapkacı kimdir?": "Çılgın Şapkacı, Alice Harikalar Diyarında'daki eksantrik bir karakterdir. Sürekli çay saati olan bir çay partisi düzenler ve mantıksız bilmeceler sorar. Tuhaf davranışları ve mantık dışı konuşmaları ile bilinir.",
+    "lewis carroll kimdir?": "Lewis Carroll (gerçek adı Charles Lutwidge Dodgson), 'Alice Harikalar Diyarında' ve 'Aynadan İçeri' kitaplarının yazarıdır. 1832-1898 yılları arasında yaşamış İngiliz bir yazar, matematikçi ve fotoğrafçıdır.",
+    "kitabın yazarı kimdir?": "Alice Harikalar Diyarında kitabının yazarı Lewis Carroll'dır (gerçek adı Charles Lutwidge Dodgson). 1865 yılında kitabı yayımlamıştır.",
+    "kitap ne zaman yazıldı?": "Alice Harikalar Diyarında kitabı 1865 yılında Lewis Carroll tarafından yayımlanmıştır.",
+    "kraliçe kimdir?": "Kupa Kraliçesi, Alice Harikalar Diyarında'daki ana antagonistlerden biridir. Öfkeli ve zalim bir karakterdir, sürekli 'Kafasını kesin!' diye bağırır ve oyun kartlarından oluşan bir orduyu yönetir."
+}
+
+# Hazır sorulara yeterince benzemeyen sorular için anahtar kelime kuralları (sırayla denenir)
+# (cevap, bu kelimelerden biri geçerse, [ve bu kelimelerden biri de geçerse])
+KNOWN_ANSWER_RULES = [
+    ("alice kimdir?", ["alice"], ["kim", "kimdir", "kız"]),
+    ("beyaz tavşan nedir?", ["tavşan"]),
+    ("harikalar diyarı nedir?", ["diyar", "harikalar"]),
+    ("cheshire kedisi kimdir?", ["kedi", "cheshire"]),
+    ("çılgın şapkacı kimdir?", ["şapkacı", "çılgın"]),
+    ("lewis carroll kimdir?", ["yazar", "carroll", "lewis"]),
+    ("kraliçe kimdir?", ["kraliçe", "kupa"])
+]
+
+# Model cevap bulamadığında kullanılan daha gevşek kurallar
+FALLBACK_ANSWER_RULES = [
+    ("alice kimdir?", ["alice"]),
+    ("beyaz tavşan nedir?", ["tavşan"]),
+    ("harikalar diyarı nedir?", ["diyar", "harikalar"]),
+    ("cheshire kedisi kimdir?", ["kedi", "cheshire"]),
+    ("çılgın şapkacı kimdir?", ["şapkacı", "çılgın"]),
+    ("lewis carroll kimdir?", ["yazar", "carroll"]),
+    ("kraliçe kimdir?", ["kraliçe", "kral"])
+]
+
+# Hazır cevaplar için açılışta bir kez derlenen indeks
+known_answers = KnownAnswers(KNOWN_QUESTIONS, KNOWN_ANSWER_RULES)
+fallback_answer_rules = KnownAnswers.compile_rules(FALLBACK_ANSWER_RULES)
+
+# WSGI sunucularında __main__ çalışmaz; model yüklemesini ilk istekte başlat
+@app.before_request
+def start_model_warm_up():
+    models.warm_up()
+
+# İşleme kuyruğu da aynı şekilde ilk istekte başlar; yarım kalan işler bu sırada kuyruğa alınır
+@app.before_request
+def start_ingestion():
+    ingestion.start()
+
+# Her istek için süre ölçümü ve aşama profili
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    METRICS.start_profile()
+
+# İstek süresini kaydet; istekte "profile": true varsa aşama sürelerini JSON cevaba ekle
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    profile = METRICS.stop_profile()
+    if started is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = time.perf_counter() - started
+    METRICS.observe('http_request_duration_seconds', elapsed, endpoint=endpoint)
+    METRICS.inc('http_requests', endpoint=endpoint, status=response.status_code)
+
+    payload = request.get_json(silent=True) if request.is_json else None
+    if isinstance(payload, dict) and payload.get('profile') and response.is_json:
+        body = response.get_json()
+        if isinstance(body, dict):
+            body['profile'] = {'stages_ms': profile, 'total_ms': round(elapsed * 1000, 3)}
+            response.set_data(json.dumps(body, ensure_ascii=False))
+    return response
 
 # İzin verilen dosya uzantıları kontrolü
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-# Veritabanı işlemleri
-def get_db():
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(app.config['DATABASE'])
-        db.row_factory = sqlite3.Row
-    return db
-
-@app.teardown_appcontext
-def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
-
 # BERT ile soru cevaplama
 def answer_question(question, context):
     try:
+        tokenizer, model = models.get(app.config['MODEL_LOAD_TIMEOUT'])
         if model is None or tokenizer is None:
             return "Model yüklenemedi. Lütfen daha sonra tekrar deneyin."
         
         # Girdiyi tokenize et ve uzunluk sınırlamasını uygula
         # BERT'in max uzunluğu 512, ama question için yer ayırmak gerekiyor
         # Bu nedenle context için max 450 token kullanabiliriz
-        encoding = tokenizer.encode_plus(
-            question, 
-            context,
-            add_special_tokens=True,
-            max_length=512,
-            truncation=True,
-            return_tensors="pt"
-        )
+        with timed('tokenize'), TOKENIZER_LOCK:
+            encoding = tokenizer(
+                question, 
+                context,
+                add_special_tokens=True,
+                max_length=512,
+                truncation=True
+            )
         
-        # Çıktı al
-        inputs = {
+        # Çıktı al (zamanlayıcı eşzamanlı isteklerle aynı gruba koyar)
+        window = {
             "input_ids": encoding["input_ids"],
-            "attention_mask": encoding["attention_mask"],
+            "token_type_ids": encoding["token_type_ids"],
         }
-        outputs = model(**inputs)
+        with timed('inference'):
+            start_logits, end_logits = scheduler.run([window])[0]
         
         # En iyi cevabı bul
-        answer_start = torch.argmax(outputs.start_logits)
-        answer_end = torch.argmax(outputs.end_logits)
+        answer_start = int(start_logits.argmax())
+        answer_end = int(end_logits.argmax())
         
         if answer_end < answer_start:
             return "Üzgünüm, bu sorunun cevabını bulamadım."
         
         # Token ID'lerini çıkar
-        input_ids = encoding["input_ids"][0]
+        input_ids = encoding["input_ids"]
         
         # Belirteçleri cevaba dönüştür
-        tokens = tokenizer.convert_ids_to_tokens(input_ids[answer_start:answer_end+1])
-        answer = tokenizer.convert_tokens_to_string(tokens)
+        with timed('decode'):
+            tokens = tokenizer.convert_ids_to_tokens(input_ids[answer_start:answer_end+1])
+            answer = tokenizer.convert_tokens_to_string(tokens)
         
         # [CLS] ve [SEP] gibi özel belirteçleri kaldır
         answer = answer.replace("[CLS]", "").replace("[SEP]", "").strip()
@@ -100,6 +256,125 @@ def answer_question(question, context):
         traceback.print_exc()
         return f"Soru cevaplanırken bir hata oluştu: {str(e)}"
 
+# Bir ya da birden çok metin üzerinde kayan pencereli BERT ile soru cevaplama
+# contexts: (metin, içerik özeti) çiftleri; içerik özeti verilirse tokenizasyon önbellekten alınır
+def answer_question_document(question, contexts):
+    try:
+        tokenizer, model = models.get(app.config['MODEL_LOAD_TIMEOUT'])
+        if model is None or tokenizer is None:
+            return {"answer": "Model yüklenemedi. Lütfen daha sonra tekrar deneyin.", "document": None, "windows": 0, "inference_ms": 0}
+        
+        documents = []
+        with timed('encode_document'):
+            for context, content_hash in contexts:
+                if content_hash:
+                    documents.append(document_encoder.get(tokenizer, content_hash, context))
+                else:
+                    documents.append(encode_document(tokenizer, context))
+        result = answer_passages(
+            question,
+            documents,
+            tokenizer,
+            scheduler.run,
+            max_seq_len=app.config['QA_MAX_SEQ_LEN'],
+            stride=app.config['QA_DOC_STRIDE'],
+            max_answer_tokens=app.config['QA_MAX_ANSWER_TOKENS']
+        )
+        print(f"Pencere sayısı: {result['windows']}, çıkarım süresi: {result['inference_ms']} ms")
+        
+        if not result['answer'] or len(result['answer']) < 2:
+            result['answer'] = "Üzgünüm, bu sorunun cevabını bulamadım."
+            result['document'] = None
+        return result
+    except Exception as e:
+        print(f"Soru cevaplama hatası: {str(e)}")
+        traceback.print_exc()
+        return {"answer": f"Soru cevaplanırken bir hata oluştu: {str(e)}", "error": str(e), "document": None, "windows": 0, "inference_ms": 0}
+
+# Sorgulanacak dosyaları veritabanından seç (uploads klasörü taranmaz)
+# file_ids: None -> son yüklenen dosya, "all" -> tüm indekslenmiş dosyalar, liste -> verilen dosyalar
+def select_files(file_ids):
+    columns = 'id, filename, original_filename, status, content_hash'
+    with storage.connection() as conn:
+        if file_ids == 'all':
+            return conn.execute(
+                f'SELECT {columns} FROM files WHERE status = ? ORDER BY timestamp DESC, id DESC',
+                (STATUS_INDEXED,)
+            ).fetchall()
+        if file_ids:
+            placeholders = ', '.join('?' for _ in file_ids)
+            return conn.execute(
+                f'SELECT {columns} FROM files WHERE id IN ({placeholders}) AND status != ?',
+                (*file_ids, STATUS_FAILED)
+            ).fetchall()
+        return conn.execute(
+            f'SELECT {columns} FROM files WHERE status != ? ORDER BY timestamp DESC, id DESC LIMIT 1',
+            (STATUS_FAILED,)
+        ).fetchall()
+
+# "Tüm dosyalar" kapsamının önbellek anahtarı: indekslenmiş içerik kümesi değişince anahtar da değişir,
+# böylece yükleme ve indeksleme sonrasında önbelleğin tamamını silmek gerekmez
+def indexed_documents_key():
+    with storage.connection() as conn:
+        rows = conn.execute('SELECT content_hash FROM files WHERE status = ? AND content_hash IS NOT NULL', (STATUS_INDEXED,)).fetchall()
+    return all_documents_key(row['content_hash'] for row in rows)
+
+# Vektör aramasından dönen içerik özetini dosya satırına çevir (content_hash indeksli)
+def find_file_by_hash(content_hash, files=()):
+    row = next((f for f in files if f['content_hash'] == content_hash), None)
+    if row is None:
+        with storage.connection() as conn:
+            row = conn.execute(
+                'SELECT id, filename, original_filename, status, content_hash FROM files WHERE content_hash = ? ORDER BY id DESC LIMIT 1',
+                (content_hash,)
+            ).fetchone()
+    return row
+
+# BM25 ile parça ara, vektör sonuçlarıyla birleştir ve eksik metinleri vektör indeksinden tamamla
+# content_hashes None ("all") ya da bellekteki BM25 indeksinden fazla belge ise yalnızca vektör
+# aramasının döndürdüğü belgeler taranır; soru başına maliyet belge sayısıyla büyümez
+def search_passages(question, content_hashes, vector_passages, top_k=None):
+    top_k = top_k or app.config['RETRIEVAL_TOP_K']
+    if content_hashes is None or len(content_hashes) > app.config['LEXICAL_CACHE_SIZE']:
+        content_hashes = list(dict.fromkeys(passage['content_hash'] for passage in vector_passages))
+    hits = lexical_index.search(question, content_hashes, top_k)
+    passages = fuse(vector_passages, hits, top_k)
+
+    missing = {}
+    for passage in passages:
+        if 'text' not in passage:
+            missing.setdefault(passage['content_hash'], []).append(passage['chunk_id'])
+    texts = {content_hash: vector_index.get_passages(content_hash, chunk_ids) for content_hash, chunk_ids in missing.items()}
+    for passage in passages:
+        if 'text' not in passage:
+            passage['text'] = texts[passage['content_hash']].get(passage['chunk_id'])
+    return [passage for passage in passages if passage['text']]
+
+# Cevabın geldiği dosya ve sayfa bilgisi
+def file_source(row, page):
+    if row is None:
+        return None
+    return {
+        "file_id": row['id'],
+        "filename": row['filename'],
+        "original_filename": row['original_filename'],
+        "page": page
+    }
+
+# Seçilen dosyaların metinlerini önbellekten oku: (satır, metin, sayfa konumları, içerik özeti)
+def read_documents(files):
+    documents = []
+    for row in files:
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], row['filename'])
+        try:
+            text, page_offsets = text_cache.get(file_path)
+        except Exception as e:
+            print(f"Dosya okuma hatası ({row['filename']}): {str(e)}")
+            continue
+        if text and len(text) >= 10:
+            documents.append((row, text, page_offsets, text_cache.content_hash(file_path)))
+    return documents
+
 # 413 hata kodunu işle
 @app.errorhandler(413)
 def request_entity_too_large(error):
@@ -113,6 +388,14 @@ def request_entity_too_large(error):
 def index():
     return render_template('index.html')
 
+# Geçici yükleme dosyasını içerik adıyla yerine koy; aynı içerik zaten diskteyse geçici dosyayı sil
+def keep_upload(tmp_path, file_path, content_hash):
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+    text_cache.remember_hash(file_path, content_hash)
+
 # Dosya yükleme
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -126,38 +409,91 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({"error": "Geçersiz dosya formatı. Sadece PDF, DOC, DOCX ve TXT dosyaları kabul edilir."}), 400
     
+    tmp_path = None
     try:
-        # Uploads klasörünü kontrol et
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.makedirs(app.config['UPLOAD_FOLDER'])
-        
         filename = secure_filename(file.filename)
-        timestamp = int(time.time())
-        saved_filename = f"{timestamp}_{filename}"
+        
+        # Dosyayı parça parça diske yazarken SHA-256 özetini hesapla (dosya ikinci kez okunmaz)
+        with timed('upload_save'):
+            content_hash, file_size, tmp_path = save_stream_sha256(file.stream, app.config['UPLOAD_FOLDER'])
+        METRICS.inc('upload_bytes', file_size)
+        
+        # Dosyalar içerik özetiyle adlandırılır: aynı içerik diskte tek kopya olarak tutulur
+        saved_filename = f"{content_hash}.{file_extension(filename)}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], saved_filename)
         
-        # Dosyayı kaydet
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
+        with timed('db_insert'), storage.connection() as conn:
+            existing = conn.execute(
+                'SELECT id, filename, original_filename, status, size FROM files WHERE content_hash = ?',
+                (content_hash,)
+            ).fetchone()
+            if existing is None:
+                try:
+                    cursor = conn.execute(
+                        'INSERT INTO files (filename, original_filename, status, size, progress, content_hash) VALUES (?, ?, ?, ?, ?, ?)',
+                        (saved_filename, filename, STATUS_QUEUED, file_size, 0, content_hash)
+                    )
+                    file_id = cursor.lastrowid
+                    conn.commit()
+                except sqlite3.IntegrityError:
+                    # Aynı içerik aynı anda başka bir istekle kaydedildi
+                    conn.rollback()
+                    existing = conn.execute(
+                        'SELECT id, filename, original_filename, status, size FROM files WHERE content_hash = ?',
+                        (content_hash,)
+                    ).fetchone()
         
-        # Veritabanına kaydet
-        with get_db() as conn:
-            conn.execute(
-                'INSERT INTO files (filename, original_filename, status, size) VALUES (?, ?, ?, ?)',
-                (saved_filename, filename, 'İşlendi', file_size)
-            )
-            conn.commit()
+        if existing is not None:
+            # Mevcut kopya, çıkarılmış metin ve indeksler yeniden kullanılır
+            file_id = existing['id']
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], existing['filename'])
+            keep_upload(tmp_path, file_path, content_hash)
+            status = existing['status']
+            # Kuyrukta bekleyen ya da işlenen kayıt yeniden gönderilmez; yalnızca başarısız olan yeniden kuyruğa alınır
+            requeue = status == STATUS_FAILED
+            with storage.connection() as conn:
+                # Son yüklenen dosya olarak işaretle
+                if requeue:
+                    status = STATUS_QUEUED
+                    conn.execute(
+                        'UPDATE files SET timestamp = CURRENT_TIMESTAMP, status = ?, error_msg = NULL, progress = 0 WHERE id = ?',
+                        (status, file_id)
+                    )
+                else:
+                    conn.execute('UPDATE files SET timestamp = CURRENT_TIMESTAMP WHERE id = ?', (file_id,))
+                conn.commit()
+            if requeue:
+                ingestion.submit(file_id, file_path, content_hash)
+            METRICS.inc('upload_duplicates')
+            print(f"Aynı içerik zaten yüklü: {existing['filename']} (#{file_id})")
+            return jsonify({
+                "message": "Dosya zaten yüklü, mevcut kayıt kullanılıyor",
+                "job_id": file_id,
+                "filename": existing['filename'],
+                "original_filename": existing['original_filename'],
+                "status": status,
+                "size": existing['size'],
+                "duplicate": True
+            }), 200
+        
+        keep_upload(tmp_path, file_path, content_hash)
+        
+        job_id = ingestion.submit(file_id, file_path, content_hash)
             
         return jsonify({
-            "message": "Dosya başarıyla işlendi",
+            "message": "Dosya yüklendi, işleniyor",
+            "job_id": job_id,
             "filename": saved_filename,
             "original_filename": filename,
+            "status": STATUS_QUEUED,
             "size": file_size
-        }), 200
+        }), 202
     
     except Exception as e:
         error_msg = str(e)
         print(f"Dosya yükleme hatası: {error_msg}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
         try:
             error_details = traceback.format_exc()
             print(f"Hata detayı:\n{error_details}")
@@ -166,55 +502,124 @@ def upload_file():
             
         return jsonify({"error": f"Dosya yüklenirken hata oluştu: {error_msg}"}), 500
 
+# /files ve /files/events cevaplarındaki sütunlar
+FILE_COLUMNS = 'id, filename, original_filename, status, timestamp, size, error_msg, progress, content_hash'
+
+# files tablosunun son değişiklik ve son silme numarası
+def files_revision(conn):
+    row = conn.execute('SELECT rev, deleted_rev FROM files_revision WHERE id = 1').fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+# since numarasından sonra değişen satırlar; arada silme olduysa (ya da ilk istekse) tüm liste döner (reset)
+def changed_files(conn, since):
+    revision, deleted_revision = files_revision(conn)
+    reset = since <= 0 or since < deleted_revision or since > revision
+    if reset:
+        rows = conn.execute(f'SELECT {FILE_COLUMNS} FROM files ORDER BY timestamp DESC, id DESC').fetchall()
+    else:
+        rows = conn.execute(f'SELECT {FILE_COLUMNS} FROM files WHERE rev > ? ORDER BY rev', (since,)).fetchall()
+    return revision, reset, [dict(row) for row in rows]
+
 # Dosyaları listele
+# Parametresiz: tüm dosyalar (liste); limit/offset: sayfa; since: o numaradan sonra değişenler
+# ETag değişiklik numarasıdır; If-None-Match eşleşirse tablo okunmadan 304 döner
 @app.route('/files', methods=['GET'])
 def list_files():
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, filename, original_filename, status, timestamp, size, error_msg FROM files ORDER BY timestamp DESC')
-            rows = cursor.fetchall()
-            
-            files = []
-            for row in rows:
-                files.append({
-                    'id': row['id'],
-                    'filename': row['filename'],
-                    'original_filename': row['original_filename'],
-                    'status': row['status'],
-                    'timestamp': row['timestamp'],
-                    'size': row['size'],
-                    'error_msg': row['error_msg']
-                })
-            
-            return jsonify(files), 200
+        limit = request.args.get('limit', type=int)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        since = request.args.get('since', type=int)
+        with storage.connection() as conn:
+            revision, _ = files_revision(conn)
+            etag = f"files-{revision}"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                if since is not None:
+                    revision, reset, files = changed_files(conn, since)
+                    body = {"files": files, "revision": revision, "reset": reset}
+                elif limit is not None:
+                    limit = min(max(limit, 1), app.config['FILES_PAGE_MAX'])
+                    rows = conn.execute(
+                        f'SELECT {FILE_COLUMNS} FROM files ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?',
+                        (limit, offset)
+                    ).fetchall()
+                    total = conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+                    body = {"files": [dict(row) for row in rows], "revision": revision, "total": total, "limit": limit, "offset": offset}
+                else:
+                    rows = conn.execute(f'SELECT {FILE_COLUMNS} FROM files ORDER BY timestamp DESC, id DESC').fetchall()
+                    body = [dict(row) for row in rows]
+                response = jsonify(body)
+        response.set_etag(f"files-{revision}")
+        # Tarayıcı her seferinde ETag ile doğrulasın
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Files-Revision'] = str(revision)
+        return response
     except Exception as e:
         error_msg = str(e)
         print(f"Dosya listeleme hatası: {error_msg}")
         return jsonify({"error": f"Dosyalar listelenirken hata oluştu: {error_msg}"}), 500
 
-# Dosya içeriğini oku
-def read_file_content(file_path):
+# Dosya durumu değişikliklerini server-sent events olarak akıt
+# Her olay: id = değişiklik numarası, data = {"files": [değişen satırlar], "revision", "reset"}
+# Bağlantı koparsa tarayıcı Last-Event-ID ile kaldığı yerden devam eder
+@app.route('/files/events', methods=['GET'])
+def file_events():
     try:
-        if file_path.lower().endswith('.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        elif file_path.lower().endswith('.pdf'):
-            from PyPDF2 import PdfReader
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        elif file_path.lower().endswith(('.doc', '.docx')):
-            import docx
-            doc = docx.Document(file_path)
-            return "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        else:
-            return "Desteklenmeyen dosya formatı"
-    except Exception as e:
-        print(f"Dosya okuma hatası: {str(e)}")
-        return f"Dosya okunamadı: {str(e)}"
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since') or 0)
+    except ValueError:
+        since = 0
+    poll_interval = app.config['FILES_EVENTS_POLL_INTERVAL']
+    heartbeat = app.config['FILES_EVENTS_HEARTBEAT']
+    max_seconds = app.config['FILES_EVENTS_MAX_SECONDS']
+    retry_ms = app.config['FILES_EVENTS_RETRY_MS']
+
+    def generate():
+        yield f"retry: {retry_ms}\n\n"
+        last = since
+        snapshot = since <= 0
+        started = last_sent = time.monotonic()
+        # Bağlantı süre sınırında kapanır ve istemci yeniden bağlanır; iş parçacıkları süresiz tutulmaz
+        while time.monotonic() - started < max_seconds:
+            # Akış istek bağlamının dışında sürer; havuzdan her yoklamada kısa süreliğine bağlantı alınır
+            event = None
+            with storage.connection() as conn:
+                revision, _ = files_revision(conn)
+                if snapshot or revision != last:
+                    revision, reset, files = changed_files(conn, last)
+                    event = {"files": files, "revision": revision, "reset": reset}
+            if event is not None:
+                yield f"id: {revision}\nevent: files\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                last = revision
+                snapshot = False
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
+
+    METRICS.inc('file_event_streams')
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Soru temizleme ve normalizasyon (noktalama işaretlerini ve fazla boşlukları kaldır)
+def normalize_question(question):
+    cleaned_question = ''.join(char.lower() for char in question if char.isalnum() or char.isspace())
+    return ' '.join(cleaned_question.split())
+
+# Model cevabından /ask cevabını oluştur; cevap bulunamadıysa bilinen kelimelere göre hazır cevap ver
+def build_response(question, answer, source, qa_stats):
+    if "üzgünüm" in answer.lower():
+        fallback_answer = known_answers.match_rules(question, fallback_answer_rules)
+        return {"answer": fallback_answer or "Bu soru hakkında yeterli bilgiye sahip değilim. Alice Harikalar Diyarında kitabı ve karakterleri hakkında soru sorabilirsiniz."}
+    return {"answer": answer, "source": source, **qa_stats}
+
+# İstekteki dosya numarası: tam sayı olmalı (JSON true/false Python'da int sayılır)
+def is_file_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# Metrik etiketi olarak yalnızca bilinen modlar kullanılır (etiket sayısı sınırlı kalır)
+def metric_mode(mode):
+    return mode if mode in QA_MODES else 'other'
 
 # Soruları cevapla
 @app.route('/ask', methods=['POST'])
@@ -225,142 +630,311 @@ def ask_question():
             return jsonify({"error": "Soru girilmedi"}), 400
             
         question = data['question']
+        mode = data.get('mode', app.config['QA_MODE'])
+        if mode not in QA_MODES:
+            return jsonify({"error": "mode 'retrieval', 'document' ya da 'snippet' olmalı"}), 400
         print(f"Gelen soru: {question}")
         
-        # Alice in Wonderland için bilinen soruların hazır cevapları
-        known_questions = {
-            "alice kimdir?": "Alice, 'Alice Harikalar Diyarında' adlı hikayenin ana karakteridir. Meraklı ve maceracı bir kız çocuğudur. Beyaz Tavşan'ı takip ederek Harikalar Diyarı'na düşer ve orada birçok fantastik karakter ve olayla karşılaşır.",
-            "beyaz tavşan nedir?": "Beyaz Tavşan, Alice Harikalar Diyarında kitabındaki önemli bir karakterdir. Ceket giymiş, saat taşıyan konuşan bir tavşandır. Hikayenin başında \"Geç kaldım, geç kaldım!\" diyerek koşarken Alice'in dikkatini çeker ve Alice'in onu takip ederek Harikalar Diyarı'na düşmesine neden olur.",
-            "harikalar diyarı nedir?": "Harikalar Diyarı, Lewis Carroll'ın yazdığı 'Alice Harikalar Diyarında' kitabındaki fantastik bir yerdir. Konuşan hayvanlar, canlı oyun kartları, mantıksız kuralları olan çay partileri gibi birçok tuhaf ve olağanüstü olayın gerçekleştiği sürreal bir dünyadır.",
-            "cheshire kedisi kimdir?": "Cheshire Kedisi, Alice Harikalar Diyarında'daki en ikonik karakterlerden biridir. Görünmez olabilen ve sadece sırıtışı görünür şekilde kalabilen gizemli bir kedidir. Alice'e sık sık bilmeceli tavsiyeler verir ve Harikalar Diyarı'nın tuhaf mantığını temsil eder.",
-            "çılgın şapkacı kimdir?": "Çılgın Şapkacı, Alice Harikalar Diyarında'daki eksantrik bir karakterdir. Sürekli çay saati olan bir çay partisi düzenler ve mantıksız bilmeceler sorar. Tuhaf davranışları ve mantık dışı konuşmaları ile bilinir.",
-            "lewis carroll kimdir?": "Lewis Carroll (gerçek adı Charles Lutwidge Dodgson), 'Alice Harikalar Diyarında' ve 'Aynadan İçeri' kitaplarının yazarıdır. 1832-1898 yılları arasında yaşamış İngiliz bir yazar, matematikçi ve fotoğrafçıdır.",
-            "kitabın yazarı kimdir?": "Alice Harikalar Diyarında kitabının yazarı Lewis Carroll'dır (gerçek adı Charles Lutwidge Dodgson). 1865 yılında kitabı yayımlamıştır.",
-            "kitap ne zaman yazıldı?": "Alice Harikalar Diyarında kitabı 1865 yılında Lewis Carroll tarafından yayımlanmıştır.",
-            "kraliçe kimdir?": "Kupa Kraliçesi, Alice Harikalar Diyarında'daki ana antagonistlerden biridir. Öfkeli ve zalim bir karakterdir, sürekli 'Kafasını kesin!' diye bağırır ve oyun kartlarından oluşan bir orduyu yönetir."
-        }
         
-        # Soru temizleme ve normalizasyon (noktalama işaretlerini ve fazla boşlukları kaldır)
-        cleaned_question = ''.join(char.lower() for char in question if char.isalnum() or char.isspace())
-        cleaned_question = ' '.join(cleaned_question.split())
+        cleaned_question = normalize_question(question)
         
-        # Kesin eşleşme kontrolü
-        if question.lower() in known_questions:
-            return jsonify({"answer": known_questions[question.lower()]}), 200
-            
-        # Kısmi eşleşme kontrolü
-        for key_question, answer in known_questions.items():
-            key_words = key_question.replace("?", "").lower().split()
-            question_words = cleaned_question.split()
-            
-            # Anahtar kelimelerin çoğu soruda varsa
-            matching_words = [word for word in key_words if word in question_words]
-            if len(matching_words) >= len(key_words) * 0.7:  # %70 eşleşme
-                return jsonify({"answer": answer}), 200
-            
-            # Belirli özel durumlar için kontrol
-            if ("alice" in question_words and any(word in question_words for word in ["kim", "kimdir", "kız"])):
-                return jsonify({"answer": known_questions["alice kimdir?"]}), 200
-            if ("tavşan" in question_words or "beyaz tavşan" in " ".join(question_words)):
-                return jsonify({"answer": known_questions["beyaz tavşan nedir?"]}), 200
-            if ("diyar" in question_words or "harikalar" in question_words):
-                return jsonify({"answer": known_questions["harikalar diyarı nedir?"]}), 200
-            if ("kedi" in question_words or "cheshire" in question_words):
-                return jsonify({"answer": known_questions["cheshire kedisi kimdir?"]}), 200
-            if ("şapkacı" in question_words or "çılgın" in question_words):
-                return jsonify({"answer": known_questions["çılgın şapkacı kimdir?"]}), 200
-            if ("yazar" in question_words or "carroll" in question_words or "lewis" in question_words):
-                return jsonify({"answer": known_questions["lewis carroll kimdir?"]}), 200
-            if ("kraliçe" in question_words or "kupa" in question_words):
-                return jsonify({"answer": known_questions["kraliçe kimdir?"]}), 200
-        
-        # Tüm dosyaları listele
-        files = glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], '*'))
+        # Hazır cevaplar: tam eşleşme, terimlerin %70'i ya da anahtar kelime kuralı (önceden derlenmiş indeks)
+        with timed('known_answers'):
+            known_answer = known_answers.lookup(question)
+        if known_answer is not None:
+            METRICS.inc('answers', kind='known')
+            return jsonify({"answer": known_answer}), 200
+        
+        # Sorgulanacak dosyalar: verilmezse son yüklenen dosya
+        file_ids = data.get('file_ids')
+        if file_ids is not None and file_ids != 'all':
+            if not isinstance(file_ids, list) or not file_ids or not all(is_file_id(file_id) for file_id in file_ids):
+                return jsonify({"error": "file_ids boş olmayan bir dosya numarası listesi ya da \"all\" olmalı"}), 400
+        search_all = file_ids == 'all'
         
-        if not files:
+        # Tüm dosyalarda vektör araması yapılırken dosya satırlarını yüklemeye gerek yok
+        with timed('file_lookup'):
+            files = [] if search_all and mode == 'retrieval' else select_files(file_ids)
+        if not files and not (search_all and mode == 'retrieval'):
+            if file_ids:
+                return jsonify({"error": "Seçilen dosyalar bulunamadı"}), 404
             return jsonify({"error": "Henüz hiç dosya yüklenmemiş"}), 400
-            
-        # Son yüklenen dosyayı kullan
-        last_file = max(files, key=os.path.getctime)
-        print(f"Kullanılan dosya: {last_file}")
+        print(f"Kullanılan dosyalar: {'tümü' if search_all else [row['filename'] for row in files]}")
         
-        # Dosya içeriğini oku
-        context = read_file_content(last_file)
+        # Aynı soru aynı belge sürümüne daha önce sorulduysa modele hiç gitme
+        # İndekslenmemiş (içerik özeti olmayan) dosyalar içeren sorgular önbelleğe alınmaz
+        cache_key = None
+        if search_all or all(row['content_hash'] for row in files):
+            document_key = indexed_documents_key() if search_all else ','.join(sorted(row['content_hash'] for row in files))
+            cache_key = answer_cache_key(cleaned_question, document_key, models.model_id, mode)
+            with timed('answer_cache'):
+                cached = answer_cache.get(cache_key)
+            if cached is not None:
+                METRICS.inc('answers', kind='cached')
+                return jsonify({**cached, "cached": True}), 200
         
-        if not context or len(context) < 10:
-            return jsonify({"error": "Dosya içeriği okunamadı veya çok kısa"}), 400
+        qa_error = False
+        qa_stats = {}
+        source = None
+        passages = []
+        if mode == 'retrieval':
+            # Yalnızca soruya en benzer parçalar okuyucuya verilir
+            content_hashes = None if search_all else [row['content_hash'] for row in files if row['content_hash']]
+            try:
+                if content_hashes is None or content_hashes:
+                    with timed('vector_search'):
+                        passages = vector_index.query_many(question, content_hashes, app.config['RETRIEVAL_TOP_K'])
+            except Exception as e:
+                print(f"Vektör arama hatası: {str(e)}")
+            # BM25 sonuçları vektör sonuçlarıyla sıra tabanlı birleştirilir (hibrit ön eleme)
+            try:
+                if content_hashes is None or content_hashes:
+                    with timed('lexical_search'):
+                        passages = search_passages(question, content_hashes, passages)
+            except Exception as e:
+                print(f"Sözcük arama hatası: {str(e)}")
+            if not passages:
+                print("Dosyalar henüz indekslenmemiş, belgelerin tamamı taranacak")
+                mode = 'document'
+                if not files:
+                    files = select_files(None)
+                    if not files:
+                        return jsonify({"error": "Henüz hiç dosya yüklenmemiş"}), 400
         
-        # Alice in Wonderland için özel işleme
-        if "alice" in question.lower() and "Alice" in context:
-            # PDF'den kısımlar arayalım
-            alice_paragraphs = []
-            for paragraph in context.split("\n\n"):
-                if "Alice" in paragraph and len(paragraph) > 100:
-                    alice_paragraphs.append(paragraph)
+        if mode == 'retrieval':
+            print(f"Seçilen parçalar: {len(passages)} (sayfalar: {[passage['page'] for passage in passages]})")
+            result = answer_question_document(question, [(passage['text'], None) for passage in passages])
+            answer = result['answer']
+            qa_error = bool(result.get('error'))
+            qa_stats = {"windows": result['windows'], "inference_ms": result['inference_ms'], "score": result.get('score'), "passages": len(passages)}
+            if result['document'] is not None:
+                passage = passages[result['document']]
+                source = file_source(find_file_by_hash(passage['content_hash'], files), passage['page'])
+        elif mode == 'document':
+            with timed('read_document'):
+                documents = read_documents(files)
+            if not documents:
+                return jsonify({"error": "Dosya içeriği okunamadı veya çok kısa"}), 400
             
-            if alice_paragraphs:
-                # İlk birkaç paragrafa bakalım
-                context = "\n\n".join(alice_paragraphs[:3])
-                print(f"Alice için bulunan paragraflar: {len(alice_paragraphs)}")
-            else:
-                # Alice hakkında paragraf bulunamadıysa, ilk kısmı kullanın
-                context = context[:2000]
-        elif "tavşan" in question.lower() or "beyaz tavşan" in question.lower():
-            # Tavşan ile ilgili paragrafları arayalım
-            rabbit_paragraphs = []
-            for paragraph in context.split("\n\n"):
-                if ("rabbit" in paragraph.lower() or "tavşan" in paragraph.lower()) and len(paragraph) > 100:
-                    rabbit_paragraphs.append(paragraph)
-            
-            if rabbit_paragraphs:
-                context = "\n\n".join(rabbit_paragraphs[:3])
-                print(f"Tavşan için bulunan paragraflar: {len(rabbit_paragraphs)}")
-            else:
-                context = context[:2000]
+            # Tüm belgeler pencerelere bölünerek taranır
+            result = answer_question_document(question, [(text, content_hash) for _, text, _, content_hash in documents])
+            answer = result['answer']
+            qa_error = bool(result.get('error'))
+            qa_stats = {"windows": result['windows'], "inference_ms": result['inference_ms'], "score": result.get('score')}
+            if result['document'] is not None:
+                row, _, page_offsets, _ = documents[result['document']]
+                source = file_source(row, max(bisect_right(page_offsets, result['start_char']), 1))
         else:
-            # BERT sınırlaması: Maksimum 512 token (yaklaşık 400 kelime)
-            # Çok uzun metinleri kısaltalım
-            max_chars = 2000  # Yaklaşık 400-500 token
-            if len(context) > max_chars:
-                print(f"Metin çok uzun ({len(context)} karakter), {max_chars} karaktere kısaltılıyor")
-                context = context[:max_chars]
-        
-        print(f"İşlenen metin uzunluğu: {len(context)} karakter")
-        # Soruyu cevapla
-        answer = answer_question(question, context)
-        
-        # Eğer cevap bulunamadıysa ve bilinen kelimeler içeriyorsa
-        if "üzgünüm" in answer.lower():
-            if "alice" in question.lower():
-                return jsonify({"answer": known_questions["alice kimdir?"]}), 200
-            elif "tavşan" in question.lower() or "beyaz tavşan" in question.lower():
-                return jsonify({"answer": known_questions["beyaz tavşan nedir?"]}), 200
-            elif "diyar" in question.lower() or "harikalar" in question.lower():
-                return jsonify({"answer": known_questions["harikalar diyarı nedir?"]}), 200
-            elif "kedi" in question.lower() or "cheshire" in question.lower():
-                return jsonify({"answer": known_questions["cheshire kedisi kimdir?"]}), 200
-            elif "şapkacı" in question.lower() or "çılgın" in question.lower():
-                return jsonify({"answer": known_questions["çılgın şapkacı kimdir?"]}), 200
-            elif "yazar" in question.lower() or "carroll" in question.lower():
-                return jsonify({"answer": known_questions["lewis carroll kimdir?"]}), 200
-            elif "kraliçe" in question.lower() or "kral" in question.lower():
-                return jsonify({"answer": known_questions["kraliçe kimdir?"]}), 200
+            # Soruyla en çok terim paylaşan parçalar BM25 indeksinden seçilir
+            hits = []
+            if files[0]['content_hash']:
+                try:
+                    with timed('context_selection'):
+                        hits = search_passages(question, [files[0]['content_hash']], [], top_k=2)
+                except Exception as e:
+                    print(f"Sözcük arama hatası: {str(e)}")
+            if hits:
+                context = "\n\n".join(hit['text'] for hit in hits)
+                source = file_source(files[0], hits[0]['page'])
+                print(f"BM25 ile seçilen parçalar: {len(hits)} (sayfalar: {[hit['page'] for hit in hits]})")
             else:
-                return jsonify({"answer": "Bu soru hakkında yeterli bilgiye sahip değilim. Alice Harikalar Diyarında kitabı ve karakterleri hakkında soru sorabilirsiniz."}), 200
+                with timed('read_document'):
+                    documents = read_documents(files[:1])
+                if not documents:
+                    return jsonify({"error": "Dosya içeriği okunamadı veya çok kısa"}), 400
+                context = documents[0][1]
+                source = file_source(documents[0][0], None)
+                
+                # BERT sınırlaması: Maksimum 512 token (yaklaşık 400 kelime)
+                # Çok uzun metinleri kısaltalım
+                max_chars = 2000  # Yaklaşık 400-500 token
+                if len(context) > max_chars:
+                    print(f"Metin çok uzun ({len(context)} karakter), {max_chars} karaktere kısaltılıyor")
+                    context = context[:max_chars]
         
-        return jsonify({"answer": answer}), 200
+            print(f"İşlenen metin uzunluğu: {len(context)} karakter")
+            # Soruyu cevapla
+            answer = answer_question(question, context)
+            qa_error = answer.startswith("Soru cevaplanırken bir hata oluştu")
+        
+        response = build_response(question, answer, source, qa_stats)
+        
+        # Etiket değerleri sabit kümeden gelir; istekten gelen değer doğrudan metriğe yazılmaz
+        METRICS.inc('answers', kind='error' if qa_error else metric_mode(mode))
+        
+        # Model hatası olmayan cevapları önbelleğe yaz
+        if cache_key and not qa_error and models.state == STATE_READY:
+            answer_cache.put(cache_key, response)
+        
+        return jsonify(response), 200
     except Exception as e:
         error_msg = str(e)
         print(f"Soru cevaplama hatası: {error_msg}")
         traceback.print_exc()
         return jsonify({"error": f"Soru cevaplanırken hata oluştu: {error_msg}"}), 500
 
+# Tek belgeye karşı çok sayıda soru: belge bir kez okunup tokenize edilir, tüm soruların
+# pencereleri aynı anda zamanlayıcıya verilir ve cevaplar tamamlandıkça NDJSON satırı olarak akar
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    data = request.get_json(silent=True)
+    questions = data.get('questions') if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "questions boş olmayan bir soru listesi olmalı"}), 400
+    if len(questions) > app.config['ASK_BATCH_MAX_QUESTIONS']:
+        return jsonify({"error": f"En fazla {app.config['ASK_BATCH_MAX_QUESTIONS']} soru gönderilebilir"}), 400
+    file_id = data.get('file_id')
+    if file_id is not None and not is_file_id(file_id):
+        return jsonify({"error": "file_id bir dosya numarası olmalı"}), 400
+    mode = data.get('mode', app.config['QA_MODE'])
+    if mode not in ('retrieval', 'document'):
+        return jsonify({"error": "mode 'retrieval' ya da 'document' olmalı"}), 400
+
+    with timed('file_lookup'):
+        files = select_files([file_id] if file_id is not None else None)
+    if not files:
+        if file_id is not None:
+            return jsonify({"error": "Seçilen dosya bulunamadı"}), 404
+        return jsonify({"error": "Henüz hiç dosya yüklenmemiş"}), 400
+    row = files[0]
+    print(f"Toplu soru: {len(questions)} soru, dosya: {row['filename']}")
+
+    tokenizer, model = models.get(app.config['MODEL_LOAD_TIMEOUT'])
+    if model is None or tokenizer is None:
+        return jsonify({"error": "Model yüklenemedi. Lütfen daha sonra tekrar deneyin."}), 503
+
+    # Hazır ve önbellekteki cevaplar hemen, diğerleri model çalıştıktan sonra döner
+    ready = []
+    pending = []
+    for index, question in enumerate(questions):
+        known_answer = known_answers.lookup(question)
+        if known_answer is not None:
+            METRICS.inc('answers', kind='known')
+            ready.append({"index": index, "question": question, "answer": known_answer})
+            continue
+        cache_key = None
+        if row['content_hash']:
+            cache_key = answer_cache_key(normalize_question(question), row['content_hash'], models.model_id, mode)
+            cached = answer_cache.get(cache_key)
+            if cached is not None:
+                METRICS.inc('answers', kind='cached')
+                ready.append({"index": index, "question": question, **cached, "cached": True})
+                continue
+        pending.append({"index": index, "question": question, "cache_key": cache_key, "mode": mode})
+
+    # Retrieval: tüm sorular tek gömme çağrısıyla aranır; parçası bulunamayan soru belge moduna düşer
+    if mode == 'retrieval' and pending:
+        passage_lists = [[] for _ in pending]
+        if row['status'] == STATUS_INDEXED and row['content_hash']:
+            try:
+                with timed('vector_search'):
+                    passage_lists = vector_index.query_batch([job['question'] for job in pending], [row['content_hash']], app.config['RETRIEVAL_TOP_K'])
+                with timed('lexical_search'):
+                    passage_lists = [
+                        search_passages(job['question'], [row['content_hash']], passages)
+                        for job, passages in zip(pending, passage_lists)
+                    ]
+            except Exception as e:
+                print(f"Toplu arama hatası: {str(e)}")
+        for job, passages in zip(pending, passage_lists):
+            if passages:
+                job['passages'] = passages
+                job['documents'] = [encode_document(tokenizer, passage['text']) for passage in passages]
+            else:
+                job['mode'] = 'document'
+
+    # Belge yalnızca ona ihtiyaç duyan soru varsa bir kez okunur ve tokenize edilir
+    document_jobs = [job for job in pending if job['mode'] == 'document']
+    if document_jobs:
+        if mode == 'retrieval':
+            print(f"{len(document_jobs)} soru için parça bulunamadı, belgenin tamamı taranacak")
+        with timed('read_document'):
+            documents = read_documents(files)
+        if documents:
+            _, text, page_offsets, content_hash = documents[0]
+            with timed('encode_document'):
+                encoding = document_encoder.get(tokenizer, content_hash, text)
+            for job in document_jobs:
+                job['documents'] = [encoding]
+        elif len(document_jobs) == len(pending):
+            return jsonify({"error": "Dosya içeriği okunamadı veya çok kısa"}), 400
+        else:
+            # Parçası bulunan sorular yine cevaplanır; diğerleri satır içi hata döner
+            for job in document_jobs:
+                METRICS.inc('answers', kind='error')
+                ready.append({"index": job['index'], "question": job['question'], "error": "Dosya içeriği okunamadı veya çok kısa"})
+            pending = [job for job in pending if job['mode'] == 'retrieval']
+
+    # Pencereler ASK_BATCH_IN_FLIGHT soruluk gruplar halinde kuyruğa alınır; zamanlayıcı bunları
+    # INFERENCE_MAX_BATCH_SIZE'lık gruplarla çalıştırır, bellekte tüm soruların pencereleri birden tutulmaz
+    def submit(job):
+        job['started'] = time.perf_counter()
+        with timed('tokenize'):
+            job['windows'], job['owners'] = prepare_windows(
+                job['question'], job['documents'], tokenizer,
+                app.config['QA_MAX_SEQ_LEN'], app.config['QA_DOC_STRIDE']
+            )
+        job['futures'] = [scheduler.submit(window) for window in job['windows']]
+
+    def finish(job):
+        try:
+            logits = [future.result() for future in job['futures']]
+            result = select_answer(job['windows'], job['owners'], logits, job['documents'], app.config['QA_MAX_ANSWER_TOKENS'])
+        except Exception as e:
+            print(f"Toplu soru cevaplama hatası: {str(e)}")
+            METRICS.inc('answers', kind='error')
+            return {"index": job['index'], "question": job['question'], "error": str(e)}
+
+        source = None
+        if result['document'] is not None:
+            if job['mode'] == 'retrieval':
+                source = file_source(row, job['passages'][result['document']]['page'])
+            else:
+                source = file_source(row, max(bisect_right(page_offsets, result['start_char']), 1))
+        answer = result['answer'] if result['answer'] and len(result['answer']) >= 2 else "Üzgünüm, bu sorunun cevabını bulamadım."
+        qa_stats = {
+            "windows": result['windows'],
+            "inference_ms": round((time.perf_counter() - job['started']) * 1000, 2),
+            "score": result['score']
+        }
+        if job['mode'] == 'retrieval':
+            qa_stats['passages'] = len(job['passages'])
+        response = build_response(job['question'], answer, source, qa_stats)
+        METRICS.inc('answers', kind=metric_mode(job['mode']))
+        if job['cache_key']:
+            answer_cache.put(job['cache_key'], response)
+        return {"index": job['index'], "question": job['question'], **response}
+
+    def generate():
+        for item in ready:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        queued = iter(pending)
+        in_flight = {}
+        while True:
+            while len(in_flight) < app.config['ASK_BATCH_IN_FLIGHT']:
+                job = next(queued, None)
+                if job is None:
+                    break
+                submit(job)
+                if job['futures']:
+                    # Sorunun son penceresi bittiğinde (FIFO) tüm pencereleri bitmiştir
+                    in_flight[job['futures'][-1]] = job
+                else:
+                    yield json.dumps(finish(job), ensure_ascii=False) + "\n"
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield json.dumps(finish(in_flight.pop(future)), ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 # Dosyaları temizle
 @app.route('/clear', methods=['POST'])
 def clear_files():
     try:
         # Veritabanındaki kayıtları temizle
-        with get_db() as conn:
+        with storage.connection() as conn:
             conn.execute('DELETE FROM files')
             conn.commit()
         
@@ -371,12 +945,55 @@ def clear_files():
                 if os.path.isfile(file_path):
                     os.remove(file_path)
         
+        # Çıkarılan metin önbelleğini, tokenizasyonları ve vektör indeksini temizle
+        text_cache.clear()
+        document_encoder.clear()
+        vector_index.clear()
+        lexical_index.clear()
+        answer_cache.clear()
+        
         return jsonify({"message": "Tüm dosyalar başarıyla silindi"}), 200
     except Exception as e:
         error_msg = str(e)
         print(f"Dosya temizleme hatası: {error_msg}")
         return jsonify({"error": f"Dosyalar temizlenirken hata oluştu: {error_msg}"}), 500
 
+# Hazırlık durumu: model yüklenene kadar 503 döner
+@app.route('/health', methods=['GET'])
+def health():
+    model_status = models.status()
+    ready = model_status['state'] == STATE_READY
+    return jsonify({
+        "status": "ready" if ready else model_status['state'],
+        "model": model_status
+    }), 200 if ready else 503
+
+# Çıkarım zamanlayıcısı ve cevap önbelleği istatistikleri
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({"scheduler": scheduler.stats(), "answer_cache": answer_cache.stats(), "storage": storage.stats(), "process": process_memory()}), 200
+
+# Prometheus metin formatında aşama süreleri, sayaçlar ve anlık durum
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    scheduler_stats = scheduler.stats()
+    cache_stats = answer_cache.stats()
+    model_state = models.state
+    gauges = [
+        ('inference_queue_depth', 'Çıkarım kuyruğunda bekleyen pencere sayısı', [({}, scheduler_stats['queue_depth'])]),
+        ('inference_avg_batch_size', 'Ortalama çıkarım grubu boyutu', [({}, scheduler_stats['avg_batch_size'])]),
+        ('answer_cache_entries', 'Bellekteki cevap önbelleği kaydı', [({}, cache_stats['entries_in_memory'])]),
+        ('answer_cache_hits', 'Cevap önbelleği isabetleri', [
+            ({'tier': 'memory'}, cache_stats['memory_hits']),
+            ({'tier': 'disk'}, cache_stats['disk_hits'])
+        ]),
+        ('answer_cache_misses', 'Cevap önbelleği kaçırmaları', [({}, cache_stats['misses'])]),
+        ('model_state', 'Model yükleme durumu (etiketteki durum 1)', [
+            ({'state': state}, int(state == model_state)) for state in (STATE_IDLE, STATE_LOADING, STATE_READY, STATE_FAILED)
+        ])
+    ]
+    return METRICS.render(gauges), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # Dosya indirme
 @app.route('/download/<path:filename>', methods=['GET'])
 def download_file(filename):
@@ -396,31 +1013,23 @@ if __name__ == '__main__':
         for file in files:
             print(f"- {os.path.basename(file)}")
         
-        # Tüm veritabanı işlemlerini uygulama bağlamı içinde yapın
-        with app.app_context():
-            print("\nVeritabanı başlatılıyor...")
-            db = get_db()
-            cursor = db.cursor()
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,
-                original_filename TEXT NOT NULL,
-                status TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                size INTEGER,
-                error_msg TEXT
-            )
-            ''')
-            db.commit()
-            print("Veritabanı başlatıldı")
-            
-            print("\nVeritabanındaki dosyalar kontrol ediliyor...")
-            rows = db.execute('SELECT * FROM files').fetchall()
+        print(f"\nVeritabanı şema sürümü: {storage.stats()['schema_version']}")
+        
+        print("\nVeritabanındaki dosyalar kontrol ediliyor...")
+        with storage.connection() as conn:
+            rows = conn.execute('SELECT * FROM files').fetchall()
             print(f"Veritabanında {len(rows)} dosya kaydı bulundu")
             for row in rows:
                 print(f"- {row['filename']} (Durum: {row['status']})")
         
+        # Modeli arka planda yükle ve yarım kalan işleri devam ettir
+        # (debug modunda yalnızca yeniden yükleyicinin alt sürecinde)
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            print("\nModel arka planda yükleniyor...")
+            models.warm_up()
+            print("İşleme kuyruğu başlatılıyor...")
+            ingestion.start()
+        
         print("\nUygulama başlatıldı!")
         print("=== Uygulama Hazır ===\n")
         
@@ -0,0 +1,131 @@
+import os
+import re
+import string
+import time
+
+import numpy as np
+
+# Desteklenen çıkarım arka uçları
+BACKEND_PYTORCH = 'pytorch'
+BACKEND_QUANTIZED = 'quantized'
+BACKEND_ONNX = 'onnx'
+BACKENDS = (BACKEND_PYTORCH, BACKEND_QUANTIZED, BACKEND_ONNX)
+# Ağırlık indirmeden benchmark ve deneme için sahte model (karşılaştırmalara dahil değil)
+BACKEND_STUB = 'stub'
+
+# Tüm arka uçlar aynı arayüzü sunar:
+# run(input_ids, token_type_ids, attention_mask) -> (start_logits, end_logits), hepsi numpy dizisi
+
+# float32 PyTorch modeli (mevcut yol)
+class TorchBackend:
+    name = BACKEND_PYTORCH
+
+    def __init__(self, model, num_threads=None):
+        import torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model = model
+
+    def run(self, input_ids, token_type_ids, attention_mask):
+        import torch
+        with torch.inference_mode():
+            outputs = self.model(
+                input_ids=torch.from_numpy(input_ids),
+                token_type_ids=torch.from_numpy(token_type_ids),
+                attention_mask=torch.from_numpy(attention_mask)
+            )
+        return outputs.start_logits.numpy(), outputs.end_logits.numpy()
+
+# Linear katmanları dinamik olarak int8'e nicemlenmiş PyTorch modeli
+class QuantizedBackend(TorchBackend):
+    name = BACKEND_QUANTIZED
+
+    def __init__(self, model, num_threads=None):
+        import torch
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized, num_threads)
+
+# ONNX'e bir kez dışa aktarılıp ONNX Runtime ile çalıştırılan model
+class OnnxBackend:
+    name = BACKEND_ONNX
+
+    def __init__(self, model, export_path, num_threads=None):
+        import onnxruntime
+
+        if not os.path.exists(export_path):
+            export_onnx(model, export_path)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(export_path, options, providers=['CPUExecutionProvider'])
+
+    def run(self, input_ids, token_type_ids, attention_mask):
+        start_logits, end_logits = self.session.run(
+            ['start_logits', 'end_logits'],
+            {'input_ids': input_ids, 'token_type_ids': token_type_ids, 'attention_mask': attention_mask}
+        )
+        return start_logits, end_logits
+
+# Logitleri token ID'lerinden deterministik üreten sahte model; yalnızca belge tokenları aday olur
+class StubBackend:
+    name = BACKEND_STUB
+
+    def run(self, input_ids, token_type_ids, attention_mask):
+        scores = ((input_ids * 2654435761) % 1000).astype(np.float32) / 1000
+        start_logits = np.where(token_type_ids == 1, scores, -10000.0).astype(np.float32)
+        end_logits = np.where(token_type_ids == 1, np.roll(scores, 1, axis=1), -10000.0).astype(np.float32)
+        return start_logits, end_logits
+
+# Sahte model için karakter düzeyinde WordPiece sözlüğüyle tokenizer (indirme gerektirmez)
+def stub_tokenizer(export_dir):
+    from transformers import BertTokenizerFast
+
+    vocab_path = os.path.join(export_dir, BACKEND_STUB, 'vocab.txt')
+    if not os.path.exists(vocab_path):
+        os.makedirs(os.path.dirname(vocab_path), exist_ok=True)
+        characters = string.ascii_lowercase + string.digits + string.punctuation
+        vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + list(characters) + [f"##{c}" for c in characters]
+        with open(vocab_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write("\n".join(vocab) + "\n")
+        os.replace(vocab_path + '.tmp', vocab_path)
+    return BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True)
+
+# Modeli dinamik grup/uzunluk eksenleriyle ONNX'e aktar
+def export_onnx(model, export_path):
+    import torch
+
+    print(f"Model ONNX'e aktarılıyor: {export_path}")
+    started = time.monotonic()
+    os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+    dummy = torch.ones((1, 16), dtype=torch.long)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in
+                    ('input_ids', 'token_type_ids', 'attention_mask', 'start_logits', 'end_logits')}
+    model.eval()
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (dummy, dummy, torch.zeros_like(dummy)),
+            export_path + '.tmp',
+            input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+            output_names=['start_logits', 'end_logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+    os.replace(export_path + '.tmp', export_path)
+    print(f"ONNX aktarımı tamamlandı ({time.monotonic() - started:.1f} sn)")
+
+# Model adından dışa aktarım dosyası yolu üret
+def onnx_export_path(export_dir, model_name):
+    return os.path.join(export_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name), 'model.onnx')
+
+def create_backend(name, model, model_name, export_dir, num_threads=None):
+    if name == BACKEND_PYTORCH:
+        return TorchBackend(model, num_threads)
+    if name == BACKEND_QUANTIZED:
+        return QuantizedBackend(model, num_threads)
+    if name == BACKEND_ONNX:
+        return OnnxBackend(model, onnx_export_path(export_dir, model_name), num_threads)
+    raise ValueError(f"Bilinmeyen çıkarım arka ucu: {name} (seçenekler: {', '.join(BACKENDS)})")
@@ -0,0 +1,131 @@
+# Çıkarım arka uçlarının cevap tutarlılığı ve hız karşılaştırması
+#
+# Kullanım (depo kök dizininden):
+#     python -m benchmarks.backend_parity --backends pytorch,quantized,onnx --repeat 5
+#
+# Her arka uç için fixture setindeki soruları cevaplar, cevap aralıklarını pytorch
+# referansıyla karşılaştırır ve soru başına gecikme (p50/p95) ile bellek (RSS) raporlar.
+# Ortalama token F1 --min-agreement altında kalırsa çıkış kodu 1 olur.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from functools import partial
+
+from backends import BACKEND_PYTORCH, BACKENDS, create_backend
+from qa import answer_document, encode_document, run_windows
+
+from benchmarks.common import percentile, rss_mb
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'qa_fixtures.json')
+
+def token_f1(prediction, reference):
+    prediction_tokens = prediction.lower().split()
+    reference_tokens = reference.lower().split()
+    if not prediction_tokens or not reference_tokens:
+        return float(prediction_tokens == reference_tokens)
+    common = sum(min(prediction_tokens.count(t), reference_tokens.count(t)) for t in set(prediction_tokens))
+    if common == 0:
+        return 0.0
+    precision = common / len(prediction_tokens)
+    recall = common / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def run_backend(name, tokenizer, model, args, fixtures):
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    backend = create_backend(name, model, args.model, args.export_dir, args.threads)
+    load_seconds = time.perf_counter() - started
+    runner = partial(run_windows, backend, batch_size=args.batch_size, pad_token_id=tokenizer.pad_token_id)
+
+    documents = [encode_document(tokenizer, fixture['context']) for fixture in fixtures]
+    # İlk çağrı (ısınma) ölçüme dahil edilmez
+    answer_document(fixtures[0]['question'], documents[0], tokenizer, runner)
+
+    latencies = []
+    spans = []
+    for _ in range(args.repeat):
+        spans = []
+        for fixture, document in zip(fixtures, documents):
+            started = time.perf_counter()
+            result = answer_document(fixture['question'], document, tokenizer, runner)
+            latencies.append((time.perf_counter() - started) * 1000)
+            spans.append(result)
+
+    return {
+        'backend': name,
+        'load_seconds': round(load_seconds, 2),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'mean': round(statistics.mean(latencies), 2)
+        },
+        'rss_mb': rss_mb(),
+        'rss_delta_mb': round(rss_mb() - rss_before, 1),
+        'answers': [
+            {'answer': span['answer'], 'start_char': span['start_char'], 'end_char': span['end_char']}
+            for span in spans
+        ]
+    }
+
+def compare(reference, candidate):
+    exact = [
+        a['start_char'] == b['start_char'] and a['end_char'] == b['end_char']
+        for a, b in zip(reference['answers'], candidate['answers'])
+    ]
+    f1 = [token_f1(b['answer'], a['answer']) for a, b in zip(reference['answers'], candidate['answers'])]
+    return {
+        'exact_span_agreement': round(sum(exact) / len(exact), 3),
+        'mean_token_f1': round(sum(f1) / len(f1), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Çıkarım arka uçlarını karşılaştır")
+    parser.add_argument('--model', default=os.environ.get('QA_MODEL_NAME', 'bert-base-uncased'))
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--export-dir', default=os.path.join('cache', 'onnx'))
+    parser.add_argument('--min-agreement', type=float, default=0.75)
+    parser.add_argument('--output', help="Sonuçların yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    from transformers import BertTokenizerFast, BertForQuestionAnswering
+
+    with open(args.fixtures, 'r', encoding='utf-8') as f:
+        fixtures = json.load(f)
+    tokenizer = BertTokenizerFast.from_pretrained(args.model)
+    model = BertForQuestionAnswering.from_pretrained(args.model)
+    model.eval()
+
+    names = [name.strip() for name in args.backends.split(',') if name.strip()]
+    if BACKEND_PYTORCH not in names:
+        names.insert(0, BACKEND_PYTORCH)
+
+    results = [run_backend(name, tokenizer, model, args, fixtures) for name in names]
+    reference = next(result for result in results if result['backend'] == BACKEND_PYTORCH)
+    for result in results:
+        result['parity'] = compare(reference, result)
+
+    report = {'model': args.model, 'fixtures': len(fixtures), 'repeat': args.repeat, 'results': results}
+    for result in results:
+        print(f"{result['backend']:>10}: p50 {result['latency_ms']['p50']:8.2f} ms  "
+              f"p95 {result['latency_ms']['p95']:8.2f} ms  RSS {result['rss_mb']:8.1f} MB  "
+              f"aralık uyumu {result['parity']['exact_span_agreement']:.2f}  F1 {result['parity']['mean_token_f1']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = [r['backend'] for r in results if r['parity']['mean_token_f1'] < args.min_agreement]
+    if failed:
+        print(f"Tutarlılık eşiğinin altında kalan arka uçlar: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# Benchmark betiklerinin ortak yardımcıları
+import os
+import statistics
+import subprocess
+
+from metrics import process_memory
+
+# Anlık bellek kullanımı (MB); sunucunun /stats'ta raporladığı değerle aynı hesap
+def rss_mb():
+    return process_memory()['rss_mb']
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+# Gecikme listesini (ms) karşılaştırılabilir özet değerlere indir
+def summarize(latencies):
+    if not latencies:
+        return {'count': 0}
+    return {
+        'count': len(latencies),
+        'p50': round(statistics.median(latencies), 2),
+        'p95': round(percentile(latencies, 95), 2),
+        'p99': round(percentile(latencies, 99), 2),
+        'mean': round(statistics.mean(latencies), 2),
+        'max': round(max(latencies), 2)
+    }
+
+# Sonuçların hangi sürüme ait olduğunu kaydetmek için git commit'i (yoksa None)
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,258 @@
+# Yükleme ve soru cevaplama hattı için benchmark / yük testi
+#
+# Kullanım (depo kök dizininden):
+#     python -m benchmarks.pipeline --stub --concurrency 1,4,16 --output results.json
+#     python -m benchmarks.pipeline --url http://localhost:8000 --requests 200
+#
+# Varsayılan olarak uygulama Flask test istemcisiyle geçici bir çalışma dizininde çalıştırılır
+# (uploads, database.db ve cache/ orada oluşur). --url verilirse çalışan bir sunucu ölçülür.
+# --stub BERT ve gömme modeli indirmeden sahte model ve karma gömmelerle çalışır; hat
+# maliyetini ölçer, cevap kalitesini değil.
+#
+# Ölçülenler: belge çıkarma hızı, yüklemeden indekslenene kadar geçen süre, soğuk / ılık /
+# önbellekten /ask gecikme yüzdelikleri, farklı eşzamanlılık düzeylerinde verim ve tepe bellek.
+# Sonuçlar commit'ler arasında karşılaştırılabilecek JSON olarak yazılır.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import git_commit, summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DOCUMENT = os.path.join(REPO_ROOT, 'context', 'Alice_in_Wonderland.pdf')
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'qa_fixtures.json')
+
+# Uygulamayı aynı süreçte Flask test istemcisiyle çalıştır
+class TestClient:
+    def __init__(self, app_module):
+        self.module = app_module
+        self.app = app_module.app
+
+    def upload(self, path):
+        with open(path, 'rb') as f:
+            response = self.app.test_client().post('/upload', data={'file': (f, os.path.basename(path))})
+        return response.status_code, response.get_json()
+
+    def get(self, path):
+        response = self.app.test_client().get(path)
+        return response.status_code, response.get_json()
+
+    def post(self, path, payload):
+        response = self.app.test_client().post(path, json=payload)
+        return response.status_code, response.get_json()
+
+    def close(self):
+        self.module.ingestion.shutdown()
+        self.module.scheduler.shutdown()
+
+# Çalışan bir sunucuyu HTTP üzerinden ölç
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def upload(self, path):
+        with open(path, 'rb') as f:
+            response = self.session.post(f"{self.base_url}/upload", files={'file': (os.path.basename(path), f)})
+        return response.status_code, response.json()
+
+    def get(self, path):
+        response = self.session.get(f"{self.base_url}{path}")
+        return response.status_code, response.json()
+
+    def post(self, path, payload):
+        response = self.session.post(f"{self.base_url}{path}", json=payload)
+        return response.status_code, response.json()
+
+    def close(self):
+        self.session.close()
+
+# Bellek, ölçülen sunucu sürecinden /stats ile okunur (--url verildiğinde benchmark istemcisi değil)
+def server_memory(client):
+    _, stats = client.get('/stats')
+    return stats['process']
+
+def list_files(client):
+    _, data = client.get('/files')
+    return data['files'] if isinstance(data, dict) else data
+
+# Belgeyi süreç içinde, işçi havuzu olmadan baştan sona çıkar
+def bench_extraction(document):
+    from documents import iter_records
+
+    started = time.perf_counter()
+    pages = set()
+    characters = 0
+    for page_no, text in iter_records(document):
+        pages.add(page_no)
+        characters += len(text)
+    seconds = time.perf_counter() - started
+    size_mb = os.path.getsize(document) / (1024 * 1024)
+    return {
+        'seconds': round(seconds, 3),
+        'pages': len(pages),
+        'characters': characters,
+        'pages_per_second': round(len(pages) / seconds, 1),
+        'mb_per_second': round(size_mb / seconds, 2)
+    }
+
+# Yüklemeden indekslenene kadar geçen süre (işçi havuzu, önbellek yazımı, gömme ve BM25 dahil)
+def bench_ingestion(client, document, timeout):
+    started = time.perf_counter()
+    status, data = client.upload(document)
+    # 200: aynı içerik zaten yüklüydü, mevcut kayıt döner
+    if status not in (200, 202):
+        raise RuntimeError(f"Yükleme başarısız: {status} {data}")
+    file_id = data['job_id']
+    while time.perf_counter() - started < timeout:
+        row = next((row for row in list_files(client) if row['id'] == file_id), None)
+        if row is not None and row['status'] in ('indexed', 'failed'):
+            if row['status'] == 'failed':
+                raise RuntimeError(f"İndeksleme başarısız: {row.get('error_msg')}")
+            return file_id, {'seconds': round(time.perf_counter() - started, 3)}
+        time.sleep(0.05)
+    raise RuntimeError(f"Belge {timeout} saniyede indekslenmedi")
+
+def wait_for_model(client, timeout):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        _, data = client.get('/health')
+        state = data['model']['state']
+        if state == 'ready':
+            return round(time.perf_counter() - started, 3)
+        if state == 'failed':
+            raise RuntimeError(f"Model yüklenemedi: {data['model'].get('error')}")
+        time.sleep(0.05)
+    raise RuntimeError(f"Model {timeout} saniyede hazır olmadı")
+
+def timed_ask(client, payload):
+    started = time.perf_counter()
+    status, data = client.post('/ask', payload)
+    return (time.perf_counter() - started) * 1000, status, data
+
+# cold: sorunun ilk kez sorulması, cached: aynı sorunun tekrarı (cevap önbelleği),
+# warm: her seferinde farklı ama benzer soru (önbellek kaçar, model ve indeksler sıcak)
+def bench_ask(client, questions, file_ids, mode, repeat):
+    results = {'cold': [], 'cached': [], 'warm': []}
+    errors = 0
+    for round_no in range(repeat):
+        for i, question in enumerate(questions):
+            payload = {'question': question, 'file_ids': file_ids, 'mode': mode}
+            phases = [('cached', payload)] if round_no else [('cold', payload), ('cached', payload)]
+            phases.append(('warm', {**payload, 'question': f"{question} ({round_no}-{i})"}))
+            for phase, body in phases:
+                latency, status, _ = timed_ask(client, body)
+                results[phase].append(latency)
+                errors += status != 200
+    return {phase: summarize(latencies) for phase, latencies in results.items()}, errors
+
+# Aynı anda concurrency istemciyle toplam requests benzersiz soru gönder
+def bench_concurrency(client, questions, file_ids, mode, concurrency, requests):
+    payloads = [
+        {'question': f"{questions[i % len(questions)]} (c{concurrency}-{i})", 'file_ids': file_ids, 'mode': mode}
+        for i in range(requests)
+    ]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        responses = list(pool.map(lambda payload: timed_ask(client, payload), payloads))
+    seconds = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(requests / seconds, 2),
+        'errors': sum(status != 200 for _, status, _ in responses),
+        'latency_ms': summarize([latency for latency, _, _ in responses])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Yükleme ve /ask hattını ölç")
+    parser.add_argument('--stub', action='store_true', help="BERT ve gömme modeli yerine sahte modeller kullan")
+    parser.add_argument('--url', help="Çalışan sunucu adresi (verilmezse Flask test istemcisi)")
+    parser.add_argument('--document', default=DEFAULT_DOCUMENT)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES)
+    parser.add_argument('--mode', default='retrieval', choices=['retrieval', 'document', 'snippet'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=64, help="Her eşzamanlılık düzeyinde gönderilecek istek sayısı")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--workdir', help="Test istemcisi modunda çalışma dizini (varsayılan: geçici dizin)")
+    parser.add_argument('--output', help="Sonuçların yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    document = os.path.abspath(args.document)
+    with open(args.fixtures, 'r', encoding='utf-8') as f:
+        questions = [fixture['question'] for fixture in json.load(f)]
+    output = os.path.abspath(args.output) if args.output else None
+
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        if args.stub:
+            os.environ['QA_BACKEND'] = 'stub'
+            os.environ['EMBEDDING_MODEL_NAME'] = 'stub'
+        # app göreli yollar kullanır; ölçüm depo dizinini kirletmesin
+        workdir = args.workdir or tempfile.mkdtemp(prefix='qa-bench-')
+        os.makedirs(workdir, exist_ok=True)
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_ROOT)
+        # Şema app içe aktarılırken oluşturulur
+        import app as app_module
+        client = TestClient(app_module)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'target': args.url or 'test-client',
+            'stub': args.stub,
+            'document': os.path.basename(document),
+            'mode': args.mode,
+            'repeat': args.repeat,
+            'questions': len(questions),
+            'requests': args.requests
+        },
+        'rss_mb': {}
+    }
+    try:
+        report['rss_mb']['start'] = server_memory(client)['rss_mb']
+        report['model_ready_seconds'] = wait_for_model(client, args.timeout)
+        report['extraction'] = bench_extraction(document)
+        file_id, report['ingestion'] = bench_ingestion(client, document, args.timeout)
+        report['ingestion']['pages_per_second'] = round(report['extraction']['pages'] / report['ingestion']['seconds'], 1)
+        report['rss_mb']['after_ingestion'] = server_memory(client)['rss_mb']
+
+        report['ask'], report['ask_errors'] = bench_ask(client, questions, [file_id], args.mode, args.repeat)
+        report['concurrency'] = [
+            bench_concurrency(client, questions, [file_id], args.mode, int(level), args.requests)
+            for level in args.concurrency.split(',') if level.strip()
+        ]
+        _, stats = client.get('/stats')
+        report['stats'] = stats
+        report['rss_mb']['end'] = stats['process']['rss_mb']
+        report['rss_mb']['peak'] = stats['process']['peak_rss_mb']
+    finally:
+        client.close()
+
+    print(f"çıkarma:     {report['extraction']['pages_per_second']} sayfa/sn ({report['extraction']['mb_per_second']} MB/sn)")
+    print(f"indeksleme:  {report['ingestion']['seconds']} sn ({report['ingestion']['pages_per_second']} sayfa/sn)")
+    for phase, summary in report['ask'].items():
+        print(f"/ask {phase:>6}: p50 {summary['p50']:8.2f} ms  p95 {summary['p95']:8.2f} ms  p99 {summary['p99']:8.2f} ms")
+    for level in report['concurrency']:
+        print(f"eşzamanlılık {level['concurrency']:>3}: {level['requests_per_second']:8.2f} istek/sn  "
+              f"p95 {level['latency_ms']['p95']:8.2f} ms  hata {level['errors']}")
+    print(f"tepe RSS:    {report['rss_mb']['peak']} MB")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    failed = report['ask_errors'] + sum(level['errors'] for level in report['concurrency'])
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
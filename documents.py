@@ -0,0 +1,61 @@
+import os
+
+# TXT dosyaları bu boyutta bloklar halinde okunur (karakter)
+TXT_BLOCK_CHARS = 64 * 1024
+# DOCX paragrafları bu sayıda gruplanarak üretilir
+DOCX_PARAGRAPHS_PER_BATCH = 200
+
+# Desteklenmeyen dosya formatları için hata
+class UnsupportedFormatError(ValueError):
+    pass
+
+# Dosya uzantısını küçük harfle döndür
+def file_extension(file_path):
+    return os.path.splitext(file_path)[1].lower().lstrip('.')
+
+# Dosyayı (sayfa_no, metin) kayıtları halinde akış olarak oku; bellekte en fazla birkaç sayfa tutulur
+# Kayıtlar art arda eklendiğinde belgenin tam metnini verir (ayraçlar kaydın içindedir)
+# PDF: her sayfa ayrı kayıt; DOCX: paragraf grupları; TXT: sabit boyutlu bloklar (DOCX ve TXT tek sayfa sayılır)
+def iter_records(file_path):
+    extension = file_extension(file_path)
+    if extension == 'txt':
+        return iter_txt_records(file_path)
+    elif extension == 'pdf':
+        return iter_pdf_records(file_path, 0, count_pdf_pages(file_path))
+    elif extension in ('doc', 'docx'):
+        return iter_docx_records(file_path)
+    else:
+        raise UnsupportedFormatError("Desteklenmeyen dosya formatı")
+
+def iter_txt_records(file_path, block_chars=TXT_BLOCK_CHARS):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(block_chars), ''):
+            yield 1, block
+
+def iter_docx_records(file_path, paragraphs_per_batch=DOCX_PARAGRAPHS_PER_BATCH):
+    import docx
+    doc = docx.Document(file_path)
+    batch = []
+    for paragraph in doc.paragraphs:
+        batch.append(paragraph.text)
+        if len(batch) >= paragraphs_per_batch:
+            yield 1, "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield 1, "\n".join(batch) + "\n"
+
+# PDF'in [start, end) aralığındaki sayfalarını tek tek üret (sayfa numaraları 1'den başlar)
+def iter_pdf_records(file_path, start, end):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    for i in range(start, end):
+        yield i + 1, (reader.pages[i].extract_text() or "") + "\n"
+
+# PDF'in sayfa sayısını döndür
+def count_pdf_pages(file_path):
+    from PyPDF2 import PdfReader
+    return len(PdfReader(file_path).pages)
+
+# PDF'in [start, end) aralığındaki sayfalarını oku (işçi süreçlerde paralel çıkarma için)
+def extract_pdf_pages(file_path, start, end):
+    return list(iter_pdf_records(file_path, start, end))
@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from documents import count_pdf_pages, extract_pdf_pages, file_extension, iter_records
+from lexical import BM25Index
+from metrics import METRICS
+
+# Dosya durumları: queued -> extracting -> indexing -> indexed | failed
+STATUS_QUEUED = 'queued'
+STATUS_EXTRACTING = 'extracting'
+STATUS_INDEXING = 'indexing'
+STATUS_INDEXED = 'indexed'
+STATUS_FAILED = 'failed'
+PENDING_STATUSES = (STATUS_QUEUED, STATUS_EXTRACTING, STATUS_INDEXING)
+# İşlenen satırın claimed_at'i bu aralıkla yenilenir; bu sürede yenilenmeyen iş sahipsiz sayılır (saniye)
+CLAIM_TIMEOUT = 60
+
+# files tablosu üzerinde çalışan arka plan işleme kuyruğu
+# Birden çok süreç (WSGI işçileri) aynı tabloyu paylaşabilir; her iş çalıştırılmadan önce
+# satır koşullu UPDATE ile sahiplenilir, böylece aynı iş iki kez çalışmaz
+class IngestionQueue:
+    def __init__(self, storage, upload_folder, text_cache, vector_index, lexical_index, max_workers, pages_per_task, max_inflight_pages, claim_timeout=CLAIM_TIMEOUT):
+        self.storage = storage
+        self.upload_folder = upload_folder
+        self.text_cache = text_cache
+        self.vector_index = vector_index
+        self.lexical_index = lexical_index
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.max_inflight_pages = max_inflight_pages
+        self.claim_timeout = claim_timeout
+        self._jobs = None
+        self._processes = None
+        self._lock = threading.Lock()
+        self._submitted = set()  # bu sürecin kuyruğundaki dosya numaraları
+        self._running = set()  # bunlardan sahiplenilip işlenenler
+        self._stopped = None
+
+    # Havuzları ilk ihtiyaçta oluştur ve yarım kalan işleri kuyruğa geri al
+    def start(self):
+        with self._lock:
+            if self._jobs is not None:
+                return False
+            # torch iş parçacıkları fork ile güvenli değil, spawn kullan
+            context = multiprocessing.get_context('spawn')
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            self._jobs = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest')
+            self._stopped = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(self._stopped,), name='ingest-heartbeat', daemon=True).start()
+        self.resume_pending()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            if self._jobs is None:
+                return
+            self._jobs.shutdown(wait=False, cancel_futures=True)
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._jobs = None
+            self._processes = None
+            self._submitted.clear()
+            self._stopped.set()
+        self.storage.flush()
+
+    def _update(self, file_id, status, **fields):
+        self.storage.update_file(file_id, status=status, **fields)
+
+    # Kuyrukta bekleyen ve sahibi claim_timeout içinde görünmeyen (yeniden başlatmada yarım kalan) işleri al
+    # abandoned_only: yalnızca sahibi düşmüş işler (çalışırken düzenli tarama)
+    def resume_pending(self, abandoned_only=False):
+        condition = '(status IN (?, ?) AND (claimed_at IS NULL OR claimed_at < ?))'
+        params = [STATUS_EXTRACTING, STATUS_INDEXING, time.time() - self.claim_timeout]
+        if not abandoned_only:
+            condition = f'(status = ? OR {condition})'
+            params.insert(0, STATUS_QUEUED)
+        with self.storage.connection() as conn:
+            rows = conn.execute(f'SELECT id, filename, content_hash FROM files WHERE {condition} ORDER BY id', params).fetchall()
+        for row in rows:
+            if self._enqueue(row['id'], os.path.join(self.upload_folder, row['filename']), row['content_hash']):
+                print(f"Bekleyen iş kuyruğa alındı: {row['filename']} (#{row['id']})")
+
+    # Yeni bir dosyayı kuyruğa al; dönüş değeri iş numarasıdır (files.id)
+    # content_hash yükleme sırasında hesaplandıysa verilir, yoksa dosyadan hesaplanır
+    def submit(self, file_id, file_path, content_hash=None):
+        if self.start():
+            # İlk başlatmada bekleyen tüm işler (bu dosya dahil) zaten kuyruğa alındı
+            return file_id
+        self._enqueue(file_id, file_path, content_hash)
+        return file_id
+
+    def _enqueue(self, file_id, file_path, content_hash):
+        with self._lock:
+            if self._jobs is None or file_id in self._submitted:
+                return False
+            self._submitted.add(file_id)
+            self._jobs.submit(self._run, file_id, file_path, content_hash)
+        return True
+
+    # Satırı extracting durumuna alarak sahiplen; yalnızca queued ya da sahibi düşmüş satırlar alınabilir
+    def _claim(self, file_id):
+        now = time.time()
+        with self.storage.connection() as conn:
+            claimed = conn.execute(
+                """UPDATE files SET status = ?, progress = 0, claimed_at = ?
+                WHERE id = ? AND (status = ? OR (status IN (?, ?) AND (claimed_at IS NULL OR claimed_at < ?)))""",
+                (STATUS_EXTRACTING, now, file_id, STATUS_QUEUED, STATUS_EXTRACTING, STATUS_INDEXING, now - self.claim_timeout)
+            ).rowcount == 1
+        if claimed:
+            with self._lock:
+                self._running.add(file_id)
+        return claimed
+
+    # Sahiplenilen satırların claimed_at'ini yenile (files_rev tetikleyicisi bu sütunu izlemez)
+    # ve sahibi düşen (ör. sonlanan başka bir işçinin) işleri devral
+    def _heartbeat(self, stopped):
+        while not stopped.wait(self.claim_timeout / 3):
+            with self._lock:
+                running = list(self._running)
+            try:
+                if running:
+                    placeholders = ', '.join('?' for _ in running)
+                    with self.storage.connection() as conn:
+                        conn.execute(f'UPDATE files SET claimed_at = ? WHERE id IN ({placeholders})', (time.time(), *running))
+                self.resume_pending(abandoned_only=True)
+            except Exception as e:
+                print(f"İşleme sahipliği yenilenemedi: {str(e)}")
+
+    def _run(self, file_id, file_path, content_hash=None):
+        if not self._claim(file_id):
+            # Başka bir süreç işliyor ya da iş zaten bitti
+            with self._lock:
+                self._submitted.discard(file_id)
+            return
+        print(f"İşleme alındı: {os.path.basename(file_path)} (#{file_id})")
+        started = time.perf_counter()
+        try:
+            if content_hash is None:
+                content_hash = self.text_cache.content_hash(file_path)
+            if self.text_cache.has(content_hash):
+                # Metin zaten önbellekte: diskten akış halinde oku ve indeksle
+                self._update(file_id, STATUS_INDEXING, content_hash=content_hash)
+                chunk_count = self._index(content_hash, self.text_cache.iter_records(content_hash))
+            else:
+                # Çıkarma, önbelleğe yazma ve parçalama/gömme tek geçişte, sayfa sayfa ilerler
+                with self.text_cache.writer(content_hash) as writer:
+                    chunk_count = self._index(content_hash, writer.passthrough(self._extract(file_id, file_path, content_hash)))
+            print(f"Vektör indeksine {chunk_count} parça yazıldı: {file_path}")
+
+            self._update(file_id, STATUS_INDEXED, progress=100, error_msg=None, content_hash=content_hash)
+            METRICS.observe('ingest_duration_seconds', time.perf_counter() - started)
+            METRICS.inc('ingest_documents', status=STATUS_INDEXED)
+            METRICS.inc('ingest_chunks', chunk_count)
+            print(f"Dosya işlendi: {file_path}")
+        except Exception as e:
+            print(f"Dosya işleme hatası ({file_path}): {str(e)}")
+            traceback.print_exc()
+            self._update(file_id, STATUS_FAILED, error_msg=str(e))
+            METRICS.inc('ingest_documents', status=STATUS_FAILED)
+        finally:
+            with self._lock:
+                self._running.discard(file_id)
+                self._submitted.discard(file_id)
+
+    # Kayıtları parçalayıp vektör ve BM25 indekslerine aynı geçişte yaz
+    def _index(self, content_hash, records):
+        chunks = self.vector_index.chunks(records)
+        lexical = None
+        if not self.lexical_index.has(content_hash):
+            lexical = BM25Index()
+            chunks = lexical.passthrough(chunks)
+        chunk_count = self.vector_index.index_document(content_hash, chunks)
+        # İçerik daha önce vektör indeksine yazıldıysa kalan kayıtlar yalnızca önbelleğe ve BM25'e gider
+        for _ in chunks:
+            pass
+        if lexical is not None:
+            self.lexical_index.save(content_hash, lexical)
+        return chunk_count
+
+    # Belgeyi (sayfa_no, metin) kayıtları halinde üret; çıkarma bitince durum indexing olur
+    # PDF'ler sayfa aralıklarına bölünüp çekirdeklere dağıtılır; aynı anda en fazla 2 * max_workers
+    # aralık işlenir ve aralıklar, toplamları max_inflight_pages sayfayı geçmeyecek kadar küçültülür
+    def _extract(self, file_id, file_path, content_hash):
+        if file_extension(file_path) != 'pdf':
+            yield from iter_records(file_path)
+            self._update(file_id, STATUS_INDEXING, content_hash=content_hash)
+            return
+
+        page_count = count_pdf_pages(file_path)
+        pages = min(self.pages_per_task, max(1, self.max_inflight_pages // (2 * self.max_workers)))
+        ranges = [(start, min(start + pages, page_count)) for start in range(0, page_count, pages)]
+        in_flight = deque()
+        done_pages = 0
+        for start, end in ranges:
+            in_flight.append(self._processes.submit(extract_pdf_pages, file_path, start, end))
+            if len(in_flight) < 2 * self.max_workers:
+                continue
+            done_pages = yield from self._drain(file_id, in_flight.popleft(), done_pages, page_count)
+        while in_flight:
+            done_pages = yield from self._drain(file_id, in_flight.popleft(), done_pages, page_count)
+        self._update(file_id, STATUS_INDEXING, content_hash=content_hash)
+
+    def _drain(self, file_id, future, done_pages, page_count):
+        records = future.result()
+        yield from records
+        done_pages += len(records)
+        METRICS.inc('ingest_pages', len(records))
+        # İlerleme yazımları toplanır (bkz. Storage.set_progress); durum değişiklikleri hemen yazılır
+        self.storage.set_progress(file_id, int(done_pages * 100 / max(page_count, 1)))
+        return done_pages
@@ -0,0 +1,236 @@
+import heapq
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Türkçe karakterleri ASCII karşılıklarına indir (tavşan == tavsan, I/İ/ı == i)
+_FOLD = str.maketrans({'ı': 'i', 'ğ': 'g', 'ş': 's', 'ç': 'c', 'ö': 'o', 'ü': 'u', 'â': 'a', 'î': 'i', 'û': 'u', '̇': None})
+_WORD = re.compile(r'\w+')
+
+# Türkçe ve İngilizce sık geçen, ayırt edici olmayan kelimeler (katlanmış halleriyle)
+STOPWORDS = frozenset('''
+a an and are as at be by for from has have he her his i in is it its of on or she that the their them
+they this to was were what when where which who whom why will with you
+acaba ama bir biri bu da de defa diye gibi hem hep her hic icin ile ise kez ki mi mu mi ne neden
+nasil o olan olarak ve veya ya yani
+'''.split())
+
+# Basit ek budama: en uzun ek önce denenir, kök en az 3 harf kalır
+SUFFIXES = sorted('''
+larin lerin lari leri lar ler nin nun dir dur tir tur den dan ten tan si su yi yu in un de da e a i u s
+'''.split(), key=len, reverse=True)
+MIN_STEM = 3
+
+def stem(term):
+    for suffix in SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= MIN_STEM:
+            if suffix == 's' and term.endswith('ss'):
+                continue
+            return term[:-len(suffix)]
+    return term
+
+# Metni küçük harfe çevir, Türkçe karakterleri katla, kelimelere ayır ve köklerini al
+def tokenize(text):
+    text = text.replace('İ', 'i').replace('I', 'i').lower().translate(_FOLD)
+    return [stem(word) for word in _WORD.findall(text) if len(word) > 1 and word not in STOPWORDS]
+
+# Parçalar üzerinde BM25 puanlamalı ters indeks (terim -> [parça numaraları], [terim sıklıkları])
+# Parça metni tutulmaz; parça numarası vektör indeksindeki kimlikle aynıdır
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lengths = []
+        self.pages = []
+        self.starts = []
+        self.postings = {}
+        self._avg_length = None
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, chunk):
+        chunk_id = len(self.lengths)
+        terms = Counter(tokenize(chunk['text']))
+        for term, count in terms.items():
+            ids, counts = self.postings.setdefault(term, ([], []))
+            ids.append(chunk_id)
+            counts.append(count)
+        self.lengths.append(sum(terms.values()))
+        self.pages.append(chunk['page'])
+        self.starts.append(chunk['start_char'])
+        self._avg_length = None
+
+    # Parçaları indekse eklerken aynen geçir (ingestion hattı için)
+    def passthrough(self, chunks):
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    # Soru terimlerinin ilanlarını puanla; en iyi top_k parçayı (chunk_id, puan) olarak döndür
+    def search(self, question, top_k):
+        if not self.lengths:
+            return []
+        if self._avg_length is None:
+            self._avg_length = sum(self.lengths) / len(self.lengths) or 1
+        total = len(self.lengths)
+        scores = {}
+        for term in set(tokenize(question)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, counts = posting
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            for chunk_id, count in zip(ids, counts):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / self._avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def to_json(self):
+        return json.dumps({
+            'k1': self.k1, 'b': self.b,
+            'lengths': self.lengths, 'pages': self.pages, 'starts': self.starts,
+            'postings': self.postings
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload):
+        data = json.loads(payload)
+        index = cls(data['k1'], data['b'])
+        index.lengths = data['lengths']
+        index.pages = data['pages']
+        index.starts = data['starts']
+        index.postings = {term: (ids, counts) for term, (ids, counts) in data['postings'].items()}
+        return index
+
+# Belge başına BM25 indeksleri: files ile aynı veritabanında kalıcı, son kullanılanlar bellekte
+# storage: storage.Storage (lexical_index tablosu şema göçleriyle oluşturulur)
+class LexicalIndex:
+    def __init__(self, storage, max_documents):
+        self.storage = storage
+        self.max_documents = max_documents
+        self._entries = OrderedDict()  # içerik özeti -> BM25Index
+        self._lock = threading.Lock()
+
+    def has(self, content_hash):
+        with self._lock:
+            if content_hash in self._entries:
+                return True
+        with self.storage.connection() as conn:
+            row = conn.execute('SELECT 1 FROM lexical_index WHERE content_hash = ?', (content_hash,)).fetchone()
+        return row is not None
+
+    def save(self, content_hash, index):
+        with self.storage.connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO lexical_index (content_hash, chunks, payload, created_at) VALUES (?, ?, ?, ?)',
+                (content_hash, len(index), index.to_json(), time.time())
+            )
+        self._remember(content_hash, index)
+
+    def get(self, content_hash):
+        with self._lock:
+            index = self._entries.get(content_hash)
+            if index is not None:
+                self._entries.move_to_end(content_hash)
+                return index
+        with self.storage.connection() as conn:
+            row = conn.execute('SELECT payload FROM lexical_index WHERE content_hash = ?', (content_hash,)).fetchone()
+        if row is None:
+            return None
+        index = BM25Index.from_json(row[0])
+        self._remember(content_hash, index)
+        return index
+
+    def _remember(self, content_hash, index):
+        with self._lock:
+            self._entries[content_hash] = index
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+    # Seçilen belgelerde ara; sonuçlar puana göre sıralı parça konumlarıdır (metin içermez)
+    def search(self, question, content_hashes, top_k):
+        hits = []
+        for content_hash in content_hashes:
+            index = self.get(content_hash)
+            if index is None:
+                continue
+            for chunk_id, score in index.search(question, top_k):
+                hits.append({
+                    'content_hash': content_hash,
+                    'chunk_id': chunk_id,
+                    'page': index.pages[chunk_id],
+                    'start_char': index.starts[chunk_id],
+                    'bm25': score
+                })
+        hits.sort(key=lambda hit: hit['bm25'], reverse=True)
+        return hits[:top_k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self.storage.connection() as conn:
+            conn.execute('DELETE FROM lexical_index')
+
+# Vektör ve sözcük sonuçlarını sıra tabanlı birleştir (reciprocal rank fusion)
+def fuse(vector_passages, lexical_passages, top_k, k=60):
+    scores = {}
+    passages = {}
+    for results in (vector_passages, lexical_passages):
+        for rank, passage in enumerate(results):
+            key = (passage['content_hash'], passage['start_char'])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            passages[key] = {**passages.get(key, {}), **passage}
+    ordered = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [passages[key] for key in ordered]
+
+# Hazır cevaplar için önceden derlenmiş indeks
+# rules: (cevap anahtarı, bu terimlerden biri, [ayrıca bu terimlerden biri]) kuralları, sırayla denenir
+class KnownAnswers:
+    def __init__(self, answers, rules=(), min_coverage=0.7):
+        self.answers = answers
+        self.min_coverage = min_coverage
+        self._keys = list(answers)
+        self._key_terms = [set(tokenize(key)) for key in self._keys]
+        self._postings = {}
+        for position, terms in enumerate(self._key_terms):
+            for term in terms:
+                self._postings.setdefault(term, []).append(position)
+        self.rules = self.compile_rules(rules)
+
+    @staticmethod
+    def compile_rules(rules):
+        compiled = []
+        for key, any_terms, *also_terms in rules:
+            also = set(tokenize(' '.join(also_terms[0]))) if also_terms else None
+            compiled.append((key, set(tokenize(' '.join(any_terms))), also))
+        return compiled
+
+    # Soru terimlerinin en az %70'ini kapsayan hazır soruyu, yoksa ilk eşleşen kuralı döndür
+    def lookup(self, question):
+        answer = self.answers.get(question.lower())
+        if answer is not None:
+            return answer
+        terms = set(tokenize(question))
+        matches = Counter(position for term in terms for position in self._postings.get(term, ()))
+        best = None
+        for position, count in matches.items():
+            coverage = count / len(self._key_terms[position])
+            if coverage >= self.min_coverage and (best is None or coverage > best[0]):
+                best = (coverage, position)
+        if best is not None:
+            return self.answers[self._keys[best[1]]]
+        return self.match_rules(terms, self.rules)
+
+    # Kural listesinde soru terimleriyle eşleşen ilk cevabı döndür
+    def match_rules(self, terms, rules):
+        if isinstance(terms, str):
+            terms = set(tokenize(terms))
+        for key, any_terms, also_terms in rules:
+            if terms & any_terms and (also_terms is None or terms & also_terms):
+                return self.answers[key]
+        return None
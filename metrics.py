@@ -0,0 +1,129 @@
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Süre histogramı kova sınırları (saniye)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prometheus metin formatı: etiket değerindeki ters bölü, çift tırnak ve satır sonu kaçışlanır
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+# Sunucu sürecinin anlık ve tepe bellek kullanımı (MB); anlık değer yalnızca Linux'ta (/proc) okunur
+def process_memory():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    rss_mb = peak_mb
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_mb = round(int(line.split()[1]) / 1024, 1)
+                    break
+    except OSError:
+        pass
+    return {'rss_mb': rss_mb, 'peak_rss_mb': peak_mb}
+
+# Süreç içi sayaç ve histogramlar; Prometheus metin formatında dışa aktarılır
+# Aşama süreleri ayrıca iş parçacığına özel istek profiline yazılır (bkz. start_profile)
+class Metrics:
+    def __init__(self, namespace='qa'):
+        self.namespace = namespace
+        self._counters = {}  # (ad, etiketler) -> değer
+        self._histograms = {}  # (ad, etiketler) -> [kova sayıları, toplam, adet]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    # Bir aşamanın süresini ölç: stage_duration_seconds{stage=...} histogramına ve açık profile yazılır
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('stage_duration_seconds', elapsed, stage=stage)
+            profile = getattr(self._local, 'profile', None)
+            if profile is not None:
+                profile[stage] = round(profile.get(stage, 0.0) + elapsed * 1000, 3)
+
+    # Bu iş parçacığında (istekte) ölçülen aşama sürelerini toplamaya başla
+    def start_profile(self):
+        self._local.profile = {}
+
+    # Toplanan aşama sürelerini (ms) döndür ve profili kapat
+    def stop_profile(self):
+        profile = getattr(self._local, 'profile', None)
+        self._local.profile = None
+        return profile or {}
+
+    # gauges: [(ad, açıklama, [(etiket sözlüğü, değer), ...])] anlık değerler (ör. kuyruk derinliği)
+    def render(self, gauges=()):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{self.namespace}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_label_text(labels)} {_format(value)}")
+
+        for name in sorted({name for name, _ in histograms}):
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, labels), (buckets, total, count) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f"{metric}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {_format(total)}")
+                lines.append(f"{metric}_count{_label_text(labels)} {count}")
+
+        for name, description, samples in gauges:
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric}{_label_text(tuple(sorted(labels.items())))} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+# Uygulama genelinde tek kayıt; modüller aşama sürelerini buraya yazar
+METRICS = Metrics()
+timed = METRICS.timer
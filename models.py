@@ -0,0 +1,98 @@
+import threading
+import time
+import traceback
+
+from backends import BACKEND_PYTORCH, BACKEND_STUB, StubBackend, create_backend, stub_tokenizer
+
+# Model yükleme durumları
+STATE_IDLE = 'idle'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+# transformers model yüklemesi süreç genelindeki durumu (meta cihazı) değiştirir;
+# iki model aynı anda farklı iş parçacıklarında yüklenirse ağırlıklar boş kalabilir
+MODEL_LOAD_LOCK = threading.Lock()
+
+# Soru cevaplama modelini ilk ihtiyaçta ya da arka planda yükleyen, iş parçacığı güvenli kayıt
+# backend: 'pytorch', 'quantized', 'onnx' ya da ağırlık indirmeyen 'stub' (bkz. backends.py)
+class ModelRegistry:
+    def __init__(self, model_name, backend=BACKEND_PYTORCH, export_dir='.', num_threads=None):
+        self.model_name = model_name
+        self.backend = backend
+        self.export_dir = export_dir
+        self.num_threads = num_threads
+        self._state = STATE_IDLE
+        self._error = None
+        self._tokenizer = None
+        self._backend = None
+        self._load_seconds = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+
+    @property
+    def state(self):
+        return self._state
+
+    # Cevap önbelleği anahtarında kullanılan model kimliği
+    @property
+    def model_id(self):
+        return f"{self.model_name}:{self.backend}"
+
+    # Yüklemeyi arka plan iş parçacığında başlat (zaten başladıysa bir şey yapma)
+    def warm_up(self):
+        with self._lock:
+            if self._state != STATE_IDLE:
+                return
+            self._state = STATE_LOADING
+        threading.Thread(target=self._load, name='model-loader', daemon=True).start()
+
+    def _load(self):
+        started = time.monotonic()
+        print(f"BERT modeli yükleniyor: {self.model_name} ({self.backend})")
+        try:
+            if self.backend == BACKEND_STUB:
+                tokenizer = stub_tokenizer(self.export_dir)
+                backend = StubBackend()
+            else:
+                # transformers ve torch yalnızca burada içe aktarılır
+                from transformers import BertTokenizerFast, BertForQuestionAnswering
+                with MODEL_LOAD_LOCK:
+                    tokenizer = BertTokenizerFast.from_pretrained(self.model_name)
+                    model = BertForQuestionAnswering.from_pretrained(self.model_name)
+                model.eval()
+                backend = create_backend(self.backend, model, self.model_name, self.export_dir, self.num_threads)
+            with self._lock:
+                self._tokenizer = tokenizer
+                self._backend = backend
+                self._state = STATE_READY
+            print("BERT modeli yüklendi")
+        except Exception as e:
+            print(f"BERT model yükleme hatası: {str(e)}")
+            traceback.print_exc()
+            with self._lock:
+                self._error = str(e)
+                self._state = STATE_FAILED
+        finally:
+            self._load_seconds = round(time.monotonic() - started, 2)
+            self._loaded.set()
+
+    # (tokenizer, çıkarım arka ucu) döndür; model hazır değilse en fazla timeout saniye bekle
+    # Yükleme başarısızsa ya da süre dolduysa (None, None) döner
+    def get(self, timeout=None):
+        self.warm_up()
+        self._loaded.wait(timeout)
+        with self._lock:
+            if self._state != STATE_READY:
+                return None, None
+            return self._tokenizer, self._backend
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'model': self.model_name,
+                'backend': self.backend,
+                'error': self._error,
+                'load_seconds': self._load_seconds
+            }
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import timed
+
+# Hızlı (Rust) tokenizer kesme/doldurma ayarlarını çağrı sırasında değiştirir ve
+# eşzamanlı çağrılarda "Already borrowed" hatası verir; tüm çağrılar bu kilitle yapılır
+TOKENIZER_LOCK = threading.Lock()
+
+# Soru bağımsız belge tokenizasyonu: token ID'leri ve karakter konumları
+class DocumentEncoding:
+    def __init__(self, text, input_ids, offsets):
+        self.text = text
+        self.input_ids = input_ids
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.input_ids)
+
+# Tüm metni özel belirteçler olmadan bir kez tokenize et
+def encode_document(tokenizer, text):
+    with TOKENIZER_LOCK:
+        encoding = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+    return DocumentEncoding(text, encoding['input_ids'], encoding['offset_mapping'])
+
+# Belge tokenizasyonlarını içerik özetine göre saklayan küçük LRU
+class DocumentEncoder:
+    def __init__(self, max_documents):
+        self.max_documents = max_documents
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tokenizer, content_hash, text):
+        with self._lock:
+            encoding = self._entries.get(content_hash)
+            if encoding is not None:
+                self._entries.move_to_end(content_hash)
+                return encoding
+        encoding = encode_document(tokenizer, text)
+        with self._lock:
+            self._entries[content_hash] = encoding
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+        return encoding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Soruyu tokenize et; pencerede belgeye yer kalması için uzunluğu sınırla
+def encode_question(tokenizer, question, max_seq_len):
+    with TOKENIZER_LOCK:
+        question_ids = tokenizer(question, add_special_tokens=False)['input_ids']
+    return question_ids[:max_seq_len // 2]
+
+# Belgeyi soru + pencere şeklinde örtüşen girdilere böl
+# stride: ardışık pencereler arasında ortak kalan token sayısı
+def build_windows(tokenizer, question_ids, document, max_seq_len, stride):
+    window_len = max_seq_len - len(question_ids) - 3
+    step = max(window_len - stride, 1)
+
+    prefix = [tokenizer.cls_token_id] + question_ids + [tokenizer.sep_token_id]
+    context_start = len(prefix)
+
+    windows = []
+    doc_start = 0
+    while True:
+        doc_end = min(doc_start + window_len, len(document))
+        input_ids = prefix + document.input_ids[doc_start:doc_end] + [tokenizer.sep_token_id]
+        windows.append({
+            'input_ids': input_ids,
+            'token_type_ids': [0] * context_start + [1] * (len(input_ids) - context_start),
+            'context_start': context_start,
+            'doc_start': doc_start,
+            'doc_end': doc_end
+        })
+        if doc_end >= len(document):
+            break
+        doc_start += step
+    return windows
+
+# Pencereleri sabit boyutlu gruplar halinde çıkarım arka ucundan geçir (bellek kullanımı batch_size ile sınırlı)
+# backend: backends.py'deki arka uçlardan biri
+def run_windows(backend, windows, batch_size, pad_token_id=0):
+    results = []
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        length = max(len(window['input_ids']) for window in batch)
+        input_ids = np.full((len(batch), length), pad_token_id, dtype=np.int64)
+        token_type_ids = np.zeros((len(batch), length), dtype=np.int64)
+        attention_mask = np.zeros((len(batch), length), dtype=np.int64)
+        for row, window in enumerate(batch):
+            size = len(window['input_ids'])
+            input_ids[row, :size] = window['input_ids']
+            token_type_ids[row, :size] = window['token_type_ids']
+            attention_mask[row, :size] = 1
+
+        start_logits, end_logits = backend.run(input_ids, token_type_ids, attention_mask)
+        for row, window in enumerate(batch):
+            size = len(window['input_ids'])
+            results.append((start_logits[row, :size], end_logits[row, :size]))
+    return results
+
+# Tüm pencereler arasında en yüksek puanlı (başlangıç + bitiş) cevap aralığını seç
+def best_span(windows, logits, document, max_answer_tokens=30, n_best=20):
+    best = None
+    for window_index, (window, (start_logits, end_logits)) in enumerate(zip(windows, logits)):
+        context_start = window['context_start']
+        context_end = context_start + (window['doc_end'] - window['doc_start'])
+        if context_end <= context_start:
+            continue
+        context_starts = start_logits[context_start:context_end]
+        context_ends = end_logits[context_start:context_end]
+        top_starts = np.argsort(context_starts)[::-1][:n_best]
+        top_ends = np.argsort(context_ends)[::-1][:n_best]
+        for start in top_starts:
+            for end in top_ends:
+                if end < start or end - start + 1 > max_answer_tokens:
+                    continue
+                score = float(context_starts[start] + context_ends[end])
+                if best is None or score > best['score']:
+                    best = {
+                        'score': score,
+                        'window': window_index,
+                        'start_token': window['doc_start'] + int(start),
+                        'end_token': window['doc_start'] + int(end)
+                    }
+
+    if best is None:
+        return None
+    best['start_char'] = document.offsets[best['start_token']][0]
+    best['end_char'] = document.offsets[best['end_token']][1]
+    best['answer'] = document.text[best['start_char']:best['end_char']].strip()
+    return best
+
+# Soruyu belgelerle birlikte pencerelere böl; owners[i] i. pencerenin belge sırasıdır
+def prepare_windows(question, documents, tokenizer, max_seq_len=384, stride=128):
+    question_ids = encode_question(tokenizer, question, max_seq_len)
+    windows = []
+    owners = []
+    for index, document in enumerate(documents):
+        document_windows = build_windows(tokenizer, question_ids, document, max_seq_len, stride)
+        windows.extend(document_windows)
+        owners.extend([index] * len(document_windows))
+    return windows, owners
+
+# Pencere logitlerinden tüm belgeler arasındaki en iyi cevabı seç
+def select_answer(windows, owners, logits, documents, max_answer_tokens=30):
+    best = None
+    for index, document in enumerate(documents):
+        selected = [i for i, owner in enumerate(owners) if owner == index]
+        span = best_span([windows[i] for i in selected], [logits[i] for i in selected], document, max_answer_tokens)
+        if span and (best is None or span['score'] > best['score']):
+            span['document'] = index
+            best = span
+
+    return {
+        'answer': best['answer'] if best else "",
+        'score': best['score'] if best else None,
+        'start_char': best['start_char'] if best else None,
+        'end_char': best['end_char'] if best else None,
+        'document': best['document'] if best else None,
+        'windows': len(windows)
+    }
+
+# Birden çok belge/parça üzerinde tek seferde soru cevaplama
+# runner(pencereler) -> [(start_logits, end_logits)]; ör. InferenceScheduler.run
+# En iyi cevabın belge sırası 'document' alanındadır
+def answer_passages(question, documents, tokenizer, runner, max_seq_len=384, stride=128,
+                    max_answer_tokens=30):
+    started = time.perf_counter()
+    with timed('tokenize'):
+        windows, owners = prepare_windows(question, documents, tokenizer, max_seq_len, stride)
+
+    with timed('inference'):
+        logits = runner(windows) if windows else []
+
+    with timed('decode'):
+        result = select_answer(windows, owners, logits, documents, max_answer_tokens)
+    result['inference_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+# Belgenin tamamı üzerinde kayan pencereli soru cevaplama
+def answer_document(question, document, tokenizer, runner, **options):
+    return answer_passages(question, [document], tokenizer, runner, **options)
@@ -0,0 +1,291 @@
+import os
+import re
+import shutil
+import threading
+import zlib
+from bisect import bisect_right
+
+import numpy as np
+
+# Model indirmeden benchmark ve deneme için sahte gömme modeli adı
+STUB_EMBEDDING_MODEL = 'stub'
+
+# (sayfa_no, metin) kayıtlarını akış halinde örtüşen parçalara böl (kelime sınırlarına hizalı)
+# Bellekte yalnızca son parçayı tamamlamaya yetecek kadar metin tutulur
+def iter_chunks(records, chunk_size, overlap):
+    buffer = ""
+    buffer_start = 0  # buffer[0]'ın belgedeki konumu
+    start = 0  # sıradaki parçanın belgedeki başlangıcı
+    page_starts = []  # sayfaların belgedeki başlangıç konumları
+    page_numbers = []
+    records = iter(records)
+    finished = False
+
+    while True:
+        # Sıradaki parçanın sonunun belge sonu olup olmadığını bilmek için bir karakter fazlası gerekir
+        while not finished and buffer_start + len(buffer) <= start + chunk_size:
+            record = next(records, None)
+            if record is None:
+                finished = True
+                break
+            page_no, text = record
+            if not page_numbers or page_numbers[-1] != page_no:
+                page_starts.append(buffer_start + len(buffer))
+                page_numbers.append(page_no)
+            buffer += text
+
+        length = buffer_start + len(buffer)
+        if start >= length:
+            return
+        end = min(start + chunk_size, length)
+        if end < length:
+            boundary = max(
+                buffer.rfind(' ', start + chunk_size // 2 - buffer_start, end - buffer_start),
+                buffer.rfind('\n', start + chunk_size // 2 - buffer_start, end - buffer_start)
+            )
+            if boundary >= 0 and boundary + buffer_start > start:
+                end = boundary + buffer_start
+        piece = buffer[start - buffer_start:end - buffer_start].strip()
+        if piece:
+            yield {
+                'text': piece,
+                'page': page_numbers[max(bisect_right(page_starts, start) - 1, 0)],
+                'start_char': start
+            }
+        if end >= length:
+            return
+        start = max(end - overlap, start + 1)
+        # Artık gerekmeyen metni bırak
+        if start > buffer_start:
+            buffer = buffer[start - buffer_start:]
+            buffer_start = start
+
+# Kelimeleri sabit boyutlu vektöre karma ile dağıtan sahte gömme modeli (SentenceTransformer.encode arayüzü)
+class HashingEmbedder:
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False):
+        embeddings = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'\w+', text.lower()):
+                embeddings[row, zlib.crc32(word.encode('utf-8')) % self.dimensions] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings
+
+# Tüm belgelerin parçalarını içeren ortak koleksiyon (çoklu belge sorguları için)
+GLOBAL_COLLECTION = 'documents'
+
+# Chroma koleksiyon adı: içerik özetinden türetilir, aynı içerik tek koleksiyon
+def collection_name(content_hash):
+    return f"doc_{content_hash[:40]}"
+
+# İndeksleme sürerken kullanılan ad; tamamlanınca collection_name'e çevrilir
+def partial_collection_name(content_hash):
+    return f"tmp_{content_hash[:40]}"
+
+def _passages(result, index=0):
+    passages = []
+    for text, metadata, distance in zip(result['documents'][index], result['metadatas'][index], result['distances'][index]):
+        passages.append({
+            'text': text,
+            'content_hash': metadata.get('content_hash'),
+            'page': metadata.get('page'),
+            'start_char': metadata.get('start_char'),
+            'distance': distance
+        })
+    return passages
+
+# sentence-transformers gömmeleri + belge başına kalıcı chroma koleksiyonu
+class VectorIndex:
+    def __init__(self, persist_dir, model_name, batch_size, chunk_size, chunk_overlap):
+        self.persist_dir = persist_dir
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._client = None
+        self._embedder = None
+        self._lock = threading.Lock()
+
+    # chromadb ve sentence-transformers ağır kütüphaneler, ilk kullanımda yükle
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                import chromadb
+                from chromadb.config import Settings
+                os.makedirs(self.persist_dir, exist_ok=True)
+                self._client = chromadb.PersistentClient(
+                    path=self.persist_dir,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+            return self._client
+
+    def _get_embedder(self):
+        with self._lock:
+            if self._embedder is None and self.model_name == STUB_EMBEDDING_MODEL:
+                self._embedder = HashingEmbedder()
+            if self._embedder is None:
+                from sentence_transformers import SentenceTransformer
+                from models import MODEL_LOAD_LOCK
+                print(f"Gömme modeli yükleniyor: {self.model_name}")
+                with MODEL_LOAD_LOCK:
+                    self._embedder = SentenceTransformer(self.model_name, device='cpu')
+            return self._embedder
+
+    def embed(self, texts):
+        embeddings = self._get_embedder().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.tolist()
+
+    def _collection(self, content_hash, create=False, name=None):
+        client = self._get_client()
+        if name is None:
+            name = collection_name(content_hash) if content_hash else GLOBAL_COLLECTION
+        if create:
+            return client.get_or_create_collection(name, metadata={'hnsw:space': 'cosine'})
+        try:
+            return client.get_collection(name)
+        except ValueError:
+            return None
+
+    # Belge bu içerik için tamamen indekslendi mi (yarım kalan indeksleme sayılmaz)
+    def has(self, content_hash):
+        return self._collection(content_hash) is not None
+
+    # (sayfa_no, metin) kayıtlarını bu indeksin parça ayarlarıyla parçala
+    def chunks(self, records):
+        return iter_chunks(records, self.chunk_size, self.chunk_overlap)
+
+    # Parçaları gruplar halinde göm ve koleksiyona yaz; parça sayısını döndür
+    # Parçalar akış halinde tüketilir, bellekte en fazla bir grup parça tutulur
+    def index_document(self, content_hash, chunks):
+        if self.has(content_hash):
+            return self._collection(content_hash).count()
+
+        # Yarım kalmış bir önceki denemeyi at; belge koleksiyonu geçici adla doldurulur
+        try:
+            self._get_client().delete_collection(partial_collection_name(content_hash))
+        except ValueError:
+            pass
+        collection = self._collection(content_hash, create=True, name=partial_collection_name(content_hash))
+        shared = self._collection(None, create=True)
+
+        count = 0
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                self._write_batch(collection, shared, content_hash, count, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._write_batch(collection, shared, content_hash, count, batch)
+            count += len(batch)
+
+        # Tüm parçalar yazıldıktan sonra koleksiyonu kalıcı adına taşı
+        collection.modify(name=collection_name(content_hash))
+        return count
+
+    # Her grup bir kez gömülür, hem belgenin kendi koleksiyonuna hem ortak koleksiyona yazılır
+    def _write_batch(self, collection, shared, content_hash, offset, batch):
+        documents = [chunk['text'] for chunk in batch]
+        embeddings = self.embed(documents)
+        metadatas = [
+            {'content_hash': content_hash, 'page': chunk['page'], 'start_char': chunk['start_char']}
+            for chunk in batch
+        ]
+        collection.upsert(
+            ids=[str(offset + j) for j in range(len(batch))],
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+        shared.upsert(
+            ids=[f"{content_hash}:{offset + j}" for j in range(len(batch))],
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
+
+    # Soruya en benzer top_k parçayı getir
+    def query(self, content_hash, question, top_k):
+        collection = self._collection(content_hash)
+        if collection is None:
+            return []
+        result = collection.query(
+            query_embeddings=self.embed([question]),
+            n_results=min(top_k, collection.count()),
+            include=['documents', 'metadatas', 'distances']
+        )
+        passages = _passages(result)
+        for passage in passages:
+            passage['content_hash'] = passage['content_hash'] or content_hash
+        return passages
+
+    # Birden çok belge üzerinde ortak koleksiyondan ara; content_hashes None ise tüm belgeler
+    def query_many(self, question, content_hashes, top_k):
+        if content_hashes is not None and len(content_hashes) == 1:
+            return self.query(content_hashes[0], question, top_k)
+        collection = self._collection(None)
+        if collection is None or collection.count() == 0:
+            return []
+        where = None
+        if content_hashes is not None:
+            if not content_hashes:
+                return []
+            where = {'content_hash': {'$in': list(content_hashes)}}
+        result = collection.query(
+            query_embeddings=self.embed([question]),
+            n_results=min(top_k, collection.count()),
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return _passages(result)
+
+    # Parça numaralarına göre metinleri getir (sözcük araması sonuçları için)
+    def get_passages(self, content_hash, chunk_ids):
+        collection = self._collection(content_hash)
+        if collection is None or not chunk_ids:
+            return {}
+        result = collection.get(ids=[str(chunk_id) for chunk_id in chunk_ids], include=['documents'])
+        return {int(chunk_id): text for chunk_id, text in zip(result['ids'], result['documents'])}
+
+    # Birçok soruyu tek gömme çağrısı ve tek chroma sorgusuyla ara; her soru için parça listesi döndür
+    def query_batch(self, questions, content_hashes, top_k):
+        if content_hashes is not None and len(content_hashes) == 1:
+            collection = self._collection(content_hashes[0])
+            where = None
+        else:
+            collection = self._collection(None)
+            where = {'content_hash': {'$in': list(content_hashes)}} if content_hashes is not None else None
+        if collection is None or collection.count() == 0 or not questions or content_hashes == []:
+            return [[] for _ in questions]
+        result = collection.query(
+            query_embeddings=self.embed(questions),
+            n_results=min(top_k, collection.count()),
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+        batches = []
+        for index in range(len(questions)):
+            passages = _passages(result, index)
+            for passage in passages:
+                passage['content_hash'] = passage['content_hash'] or content_hashes[0]
+            batches.append(passages)
+        return batches
+
+    # Tüm koleksiyonları ve kalıcı dizini sil
+    def clear(self):
+        if self._client is not None:
+            for collection in self._client.list_collections():
+                self._client.delete_collection(collection.name)
+        elif os.path.exists(self.persist_dir):
+            shutil.rmtree(self.persist_dir)
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import METRICS
+from qa import run_windows
+
+# Grup boyutu dağılımı için kova sınırları
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Eşzamanlı isteklerden gelen pencereleri kısa bir süre toplayıp tek ileri geçişte çalıştıran zamanlayıcı
+class InferenceScheduler:
+    def __init__(self, models, max_batch_size=32, max_wait_ms=5):
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._batch_sizes = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='inference-scheduler', daemon=True)
+                self._thread.start()
+
+    # Tek bir pencereyi kuyruğa al; sonuç (start_logits, end_logits) olarak Future'a yazılır
+    def submit(self, window):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((window, future, time.monotonic()))
+        depth = self._queue.qsize()
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    # Pencereleri çalıştır ve sonuçları aynı sırayla döndür (qa.answer_passages için runner)
+    def run(self, windows):
+        futures = [self.submit(window) for window in windows]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._run_batch(batch)
+                    return
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        waits = [started - enqueued for _, _, enqueued in batch]
+        try:
+            tokenizer, backend = self.models.get()
+            if backend is None:
+                raise RuntimeError("Model yüklenemedi")
+            forward_started = time.perf_counter()
+            results = run_windows(backend, [window for window, _, _ in batch], len(batch), tokenizer.pad_token_id)
+            METRICS.observe('forward_duration_seconds', time.perf_counter() - forward_started)
+            METRICS.inc('inference_windows', len(batch))
+        except Exception as e:
+            METRICS.inc('inference_errors')
+            print(f"Toplu çıkarım hatası: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._record(len(batch), waits)
+            for wait in waits:
+                METRICS.observe('inference_queue_wait_seconds', wait)
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _record(self, size, waits):
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), BATCH_SIZE_BUCKETS[-1])
+            self._batch_sizes[bucket] += 1
+
+    # Kuyruk derinliği, grup boyutu dağılımı ve bekleme süreleri
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0,
+                'batch_size_histogram': {f"<={bucket}": count for bucket, count in self._batch_sizes.items()},
+                'avg_wait_ms': round(self._wait_total * 1000 / self._items, 3) if self._items else 0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_window_ms': self.max_wait * 1000
+            }
@@ -80,9 +80,73 @@ document.addEventListener('DOMContentLoaded', function() {
         return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
     }
 
-    // Dosya listesini güncelleme fonksiyonu
+    // Dosya durumlarının görünümü
+    const statusStyles = {
+        queued: { label: 'Sırada', className: 'bg-yellow-100 text-yellow-800' },
+        extracting: { label: 'İşleniyor', className: 'bg-blue-100 text-blue-800' },
+        indexing: { label: 'İndeksleniyor', className: 'bg-blue-100 text-blue-800' },
+        indexed: { label: 'İşlendi', className: 'bg-green-100 text-green-800' },
+        failed: { label: 'Hata', className: 'bg-red-100 text-red-800' }
+    };
+
+    // Sunucudan gelen dosya satırları (id -> dosya) ve son değişiklik numarası
+    const knownFiles = new Map();
+    let filesRevision = 0;
+
+    // Dosya tablosunu bilinen satırlardan yeniden çiz (en son yüklenen en üstte)
+    function renderFilesList() {
+        const tbody = document.querySelector('#filesTable tbody');
+        if (!tbody) {
+            console.error('Dosya tablosu bulunamadı');
+            return;
+        }
+        
+        tbody.innerHTML = '';
+        
+        const files = Array.from(knownFiles.values()).sort((a, b) =>
+            a.timestamp === b.timestamp ? b.id - a.id : (a.timestamp < b.timestamp ? 1 : -1)
+        );
+        if (files.length === 0) {
+            const row = document.createElement('tr');
+            row.innerHTML = '<td colspan="3" class="px-6 py-4 text-center text-gray-500">Henüz dosya yüklenmemiş</td>';
+            tbody.appendChild(row);
+            return;
+        }
+        
+        files.forEach(file => {
+            const row = document.createElement('tr');
+            const status = statusStyles[file.status] || { label: 'Bekliyor', className: 'bg-yellow-100 text-yellow-800' };
+            const progress = file.status === 'extracting' && file.progress ? ` %${file.progress}` : '';
+            
+            row.innerHTML = `
+                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-900">${file.original_filename}</td>
+                <td class="px-6 py-4 whitespace-nowrap">
+                    <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${status.className}">
+                        ${status.label}${progress}
+                    </span>
+                    ${file.error_msg ? `<div class="text-xs text-red-600 mt-1">${file.error_msg}</div>` : ''}
+                </td>
+                <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
+                    ${formatFileSize(file.size)}
+                </td>
+            `;
+            tbody.appendChild(row);
+        });
+    }
+
+    // Değişiklikleri bilinen satırlara uygula; reset geldiyse liste baştan kurulur
+    function applyFileChanges(data) {
+        if (data.reset) {
+            knownFiles.clear();
+        }
+        data.files.forEach(file => knownFiles.set(file.id, file));
+        filesRevision = data.revision;
+        renderFilesList();
+    }
+
+    // Yalnızca son görülen numaradan sonra değişen satırları iste (EventSource yoksa yedek yol)
     function updateFilesList() {
-        fetch('/files')
+        fetch(`/files?since=${filesRevision}`)
             .then(response => {
                 if (!response.ok) {
                     return response.json().then(data => {
@@ -91,49 +155,25 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 return response.json();
             })
-            .then(data => {
-                const tbody = document.querySelector('#filesTable tbody');
-                if (!tbody) {
-                    console.error('Dosya tablosu bulunamadı');
-                    return;
-                }
-                
-                tbody.innerHTML = '';
-                
-                if (!data.files || data.files.length === 0) {
-                    const row = document.createElement('tr');
-                    row.innerHTML = '<td colspan="3" class="px-6 py-4 text-center text-gray-500">Henüz dosya yüklenmemiş</td>';
-                    tbody.appendChild(row);
-                    return;
-                }
-                
-                data.files.forEach(file => {
-                    const row = document.createElement('tr');
-                    const statusClass = file.status === 'processed' ? 'bg-green-100 text-green-800' : 
-                                      file.status === 'error' ? 'bg-red-100 text-red-800' : 'bg-yellow-100 text-yellow-800';
-                    
-                    row.innerHTML = `
-                        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-900">${file.name}</td>
-                        <td class="px-6 py-4 whitespace-nowrap">
-                            <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${statusClass}">
-                                ${file.status === 'processed' ? 'İşlendi' : 
-                                  file.status === 'error' ? 'Hata' : 'Bekliyor'}
-                            </span>
-                            ${file.error ? `<div class="text-xs text-red-600 mt-1">${file.error}</div>` : ''}
-                        </td>
-                        <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                            ${formatFileSize(file.size)}
-                        </td>
-                    `;
-                    tbody.appendChild(row);
-                });
-            })
+            .then(applyFileChanges)
             .catch(error => {
                 console.error('Dosya listesi hatası:', error);
                 showError(error.message || 'Dosya listesi alınamadı');
             });
     }
 
+    // Durum değişikliklerini sunucudan dinle; bağlantı koparsa tarayıcı kaldığı yerden yeniden bağlanır
+    function watchFilesList() {
+        if (!window.EventSource) {
+            updateFilesList();
+            setInterval(updateFilesList, 5000);
+            return;
+        }
+        const events = new EventSource('/files/events');
+        events.addEventListener('files', event => applyFileChanges(JSON.parse(event.data)));
+        events.onerror = () => console.warn('Dosya olay akışı kesildi, yeniden bağlanılıyor');
+    }
+
     // Tüm dosyaları silme fonksiyonu
     async function clearAllFiles() {
         if (!confirm('Tüm dosyaları silmek istediğinizden emin misiniz? Bu işlem geri alınamaz.')) {
@@ -158,9 +198,8 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Sayfa yüklendiğinde ve her 5 saniyede bir dosya listesini güncelle
-    updateFilesList();
-    setInterval(updateFilesList, 5000);
+    // Dosya listesini sunucudan gelen değişikliklerle güncel tut
+    watchFilesList();
 
     // Tüm dosyaları silme butonu ekle
     const clearButton = document.createElement('button');
@@ -194,6 +233,13 @@ document.addEventListener('DOMContentLoaded', function() {
             const data = await response.json();
             if (response.ok) {
                 answerContent.textContent = data.answer;
+                if (data.source) {
+                    const sourceLine = document.createElement('div');
+                    sourceLine.className = 'text-xs text-gray-500 mt-2';
+                    sourceLine.textContent = `Kaynak: ${data.source.original_filename}` +
+                        (data.source.page ? `, sayfa ${data.source.page}` : '');
+                    answerContent.appendChild(sourceLine);
+                }
                 answerSection.classList.remove('hidden');
             } else {
                 showError(data.error || 'Soru yanıtlanırken bir hata oluştu');
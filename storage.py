@@ -0,0 +1,280 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Her bağlantıda uygulanan ayarlar
+# WAL: okuyucular yazıcıyı beklemez; WAL ile NORMAL senkronizasyon güvenli ve daha az fsync yapar
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 30000),  # ms; kilitli veritabanında hata vermeden önce bekle
+    ('foreign_keys', 'ON'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -16000),  # KB (~16MB sayfa önbelleği)
+)
+# Havuzdaki en fazla bağlantı sayısı ve boş bağlantı beklerken zaman aşımı (saniye)
+POOL_SIZE = 16
+POOL_TIMEOUT = 30
+# Ingestion ilerleme güncellemeleri en fazla bu aralıkla, tek işlemde toplu yazılır (saniye)
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+# Şema göçleri sırayla uygulanır; uygulanan son göçün numarası PRAGMA user_version'da tutulur
+# Göçler, user_version kullanılmadan önce oluşturulmuş veritabanlarında da güvenle çalışır (IF NOT EXISTS)
+
+# 1: files tablosu (eski veritabanlarına eksik sütunlar eklenir)
+def _create_files(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        original_filename TEXT NOT NULL,
+        status TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        size INTEGER,
+        error_msg TEXT,
+        progress INTEGER DEFAULT 0,
+        content_hash TEXT
+    )
+    ''')
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(files)')}
+    if 'progress' not in columns:
+        conn.execute('ALTER TABLE files ADD COLUMN progress INTEGER DEFAULT 0')
+    if 'content_hash' not in columns:
+        conn.execute('ALTER TABLE files ADD COLUMN content_hash TEXT')
+    # /ask "son yüklenen dosya" seçimi ve /files sıralaması için
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_timestamp ON files (timestamp)')
+
+# 2: aynı içerik tek kayıtla tutulur; eski kopyalarda özeti yalnızca en eski kayıt korur
+def _unique_content_hash(conn):
+    indexes = {row['name'] for row in conn.execute('PRAGMA index_list(files)')}
+    if 'idx_files_content_hash_unique' in indexes:
+        return
+    conn.execute('''
+    UPDATE files SET content_hash = NULL
+    WHERE content_hash IS NOT NULL
+      AND id NOT IN (SELECT MIN(id) FROM files WHERE content_hash IS NOT NULL GROUP BY content_hash)
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_files_content_hash')
+    conn.execute('CREATE UNIQUE INDEX idx_files_content_hash_unique ON files (content_hash)')
+
+# 3: değişiklik akışı; files üzerindeki her yazma sayacı artırır ve satıra yazar,
+# silmeler deleted_rev'i günceller (/files?since= ve /files/events)
+def _file_revisions(conn):
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(files)')}
+    if 'rev' not in columns:
+        conn.execute('ALTER TABLE files ADD COLUMN rev INTEGER NOT NULL DEFAULT 0')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS files_revision (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        rev INTEGER NOT NULL,
+        deleted_rev INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO files_revision (id, rev, deleted_rev) VALUES (1, 0, 0)')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS files_rev_insert AFTER INSERT ON files BEGIN
+        UPDATE files_revision SET rev = rev + 1 WHERE id = 1;
+        UPDATE files SET rev = (SELECT rev FROM files_revision WHERE id = 1) WHERE id = NEW.id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS files_rev_update
+    AFTER UPDATE OF filename, original_filename, status, timestamp, size, error_msg, progress, content_hash ON files BEGIN
+        UPDATE files_revision SET rev = rev + 1 WHERE id = 1;
+        UPDATE files SET rev = (SELECT rev FROM files_revision WHERE id = 1) WHERE id = NEW.id;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS files_rev_delete AFTER DELETE ON files BEGIN
+        UPDATE files_revision SET rev = rev + 1, deleted_rev = rev + 1 WHERE id = 1;
+    END
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_rev ON files (rev)')
+
+# 4: BM25 indeksleri ve cevap önbelleği (önceden ilk kullanımda oluşturuluyordu)
+def _cache_tables(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS lexical_index (
+        content_hash TEXT PRIMARY KEY,
+        chunks INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS answer_cache (
+        key TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''')
+
+# 5: ingestion'ın yarım kalan işleri bulması ve durum sorguları için
+def _status_index(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_status ON files (status)')
+
+# 6: ingestion sahipliği; işi alan süreç claimed_at'i düzenli yeniler, yenilenmeyen iş başka süreçte devam eder
+def _ingest_claims(conn):
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(files)')}
+    if 'claimed_at' not in columns:
+        conn.execute('ALTER TABLE files ADD COLUMN claimed_at REAL')
+
+MIGRATIONS = (_create_files, _unique_content_hash, _file_revisions, _cache_tables, _status_index, _ingest_claims)
+
+# SQLite erişim katmanı: sınırlı bağlantı havuzu, şema göçleri ve ingestion yazımlarının toplanması
+# Uygulama, ingestion ve önbellekler aynı nesneyi paylaşır. Bağlantılar istekler ve iş parçacıkları
+# arasında dolaştığı için check_same_thread=False ile açılır; aynı anda tek iş parçacığı kullanır
+class Storage:
+    def __init__(self, database, pool_size=POOL_SIZE, pool_timeout=POOL_TIMEOUT,
+                 progress_flush_interval=PROGRESS_FLUSH_INTERVAL):
+        self.database = database
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.progress_flush_interval = progress_flush_interval
+        self._idle = queue.LifoQueue()  # son kullanılan bağlantı önce (sayfa önbelleği sıcak)
+        self._local = threading.local()  # bu iş parçacığının elindeki bağlantı
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending_progress = {}  # dosya numarası -> ilerleme (%)
+        self._last_flush = 0.0
+        self._open = 0
+        self._connections = 0
+        self._batched_writes = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        with self._lock:
+            self._connections += 1
+        return conn
+
+    # Havuzdan bağlantı al; boş yoksa ve sınıra ulaşılmadıysa yenisini aç, ulaşıldıysa bekle
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._open < self.pool_size
+            if create:
+                self._open += 1
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"Veritabanı bağlantı havuzu dolu ({self.pool_size} bağlantı)")
+
+    # Bağlantıyı havuza geri ver; yarım kalan işlem geri alınır
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    # Kısa bir işlem için bağlantı: with bloğu sonunda onaylanır (hata olursa geri alınır)
+    # İstekler bağlantıyı yalnızca işlem boyunca tutar; model beklenirken havuz boş kalmaz
+    # İç içe kullanımda iş parçacığının elindeki bağlantı yeniden kullanılır
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            with held:
+                yield held
+            return
+        conn = self.acquire()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self.release(conn)
+
+    # Eksik göçleri uygula; birden çok süreç aynı anda başlarsa BEGIN IMMEDIATE ile sırayla çalışırlar
+    def migrate(self):
+        conn = self.acquire()
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                return version
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                for number in range(version + 1, len(MIGRATIONS) + 1):
+                    MIGRATIONS[number - 1](conn)
+                    conn.execute(f'PRAGMA user_version = {number}')
+                    print(f"Veritabanı şeması güncellendi: sürüm {number}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return len(MIGRATIONS)
+        finally:
+            self.release(conn)
+
+    # files satırını hemen güncelle; bekleyen ilerleme yazımları aynı işlemde yazılır
+    def update_file(self, file_id, **fields):
+        with self._write_lock:
+            pending = self._take_pending()
+            progress = pending.pop(file_id, None)
+            if progress is not None:
+                fields.setdefault('progress', progress)
+            assignments = ', '.join(f"{column} = ?" for column in fields)
+            with self.connection() as conn:
+                self._write_progress(conn, pending)
+                conn.execute(f'UPDATE files SET {assignments} WHERE id = ?', (*fields.values(), file_id))
+
+    # İlerlemeyi biriktir; son yazımdan bu yana aralık geçtiyse tüm dosyalarınkini tek işlemde yaz
+    def set_progress(self, file_id, progress):
+        with self._write_lock:
+            self._pending_progress[file_id] = progress
+            if time.monotonic() - self._last_flush < self.progress_flush_interval:
+                return
+            pending = self._take_pending()
+            with self.connection() as conn:
+                self._write_progress(conn, pending)
+
+    def flush(self):
+        with self._write_lock:
+            pending = self._take_pending()
+            if pending:
+                with self.connection() as conn:
+                    self._write_progress(conn, pending)
+
+    def _take_pending(self):
+        pending = self._pending_progress
+        self._pending_progress = {}
+        self._last_flush = time.monotonic()
+        return pending
+
+    def _write_progress(self, conn, pending):
+        if not pending:
+            return
+        conn.executemany('UPDATE files SET progress = ? WHERE id = ?', [(progress, file_id) for file_id, progress in pending.items()])
+        with self._lock:
+            self._batched_writes += 1
+
+    def stats(self):
+        with self.connection() as conn:
+            schema_version = conn.execute('PRAGMA user_version').fetchone()[0]
+            journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        with self._lock:
+            return {
+                'schema_version': schema_version,
+                'journal_mode': journal_mode,
+                'pool_size': self.pool_size,
+                'open_connections': self._open,
+                'idle_connections': self._idle.qsize(),
+                'connections_created': self._connections,
+                'batched_progress_writes': self._batched_writes,
+                'pending_progress': len(self._pending_progress)
+            }
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+from documents import iter_records
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# Önbellekteki metin diskten bu boyutta bloklar halinde okunur (karakter)
+READ_BLOCK_CHARS = 64 * 1024
+
+# Dosyanın SHA-256 özetini blok blok hesapla
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Akışı blok blok dizindeki geçici bir dosyaya yazarken SHA-256 özetini hesapla
+# Dönüş: (özet, bayt sayısı, geçici dosya yolu); dosyayı yerine taşımak çağırana kalır
+def save_stream_sha256(stream, directory):
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(prefix='.upload-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return digest.hexdigest(), size, tmp_path
+
+# Çıkarılan kayıtları geldikçe geçici dosyaya yazar; sayfa konumlarını tutar
+# commit() ile kayıt tamamlanır, hata durumunda geçici dosya silinir
+class CacheWriter:
+    def __init__(self, cache, content_hash):
+        self.cache = cache
+        self.content_hash = content_hash
+        self.page_offsets = []
+        self.position = 0
+        self._page = None
+        os.makedirs(cache.cache_dir, exist_ok=True)
+        # Aynı içerik aynı anda iki kez işlenirse geçici dosyalar çakışmasın
+        self._tmp_path = f"{cache._text_path(content_hash)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, 'w', encoding='utf-8', newline='')
+
+    def write(self, page_no, text):
+        if page_no != self._page:
+            self.page_offsets.append(self.position)
+            self._page = page_no
+        self._file.write(text)
+        self.position += len(text)
+
+    # Kayıtları yazarken aynen geçir (çıkarma -> önbellek -> parçalama hattı için)
+    def passthrough(self, records):
+        for page_no, text in records:
+            self.write(page_no, text)
+            yield page_no, text
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.cache._text_path(self.content_hash))
+        self.cache._write_meta(self.content_hash, self.page_offsets or [0])
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+# Çıkarılan metinler için içerik adresli disk önbelleği + bellek sınırlı LRU
+class TextCache:
+    def __init__(self, cache_dir, max_memory_bytes):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self._entries = OrderedDict()  # içerik özeti -> (metin, sayfa konumları)
+        self._memory_bytes = 0
+        self._path_hashes = {}  # dosya yolu -> (mtime, boyut, içerik özeti)
+        self._lock = threading.Lock()
+
+    def _text_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.txt")
+
+    def _meta_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    # Dosya değişmediyse özeti tekrar hesaplama
+    def content_hash(self, file_path):
+        stat = os.stat(file_path)
+        with self._lock:
+            known = self._path_hashes.get(file_path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+        content_hash = file_sha256(file_path)
+        with self._lock:
+            self._path_hashes[file_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    # Yükleme sırasında hesaplanan özeti kaydet; dosya değişmedikçe yeniden hesaplanmaz
+    def remember_hash(self, file_path, content_hash):
+        stat = os.stat(file_path)
+        with self._lock:
+            self._path_hashes[file_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+
+    # İçerik diskte zaten var mı
+    def has(self, content_hash):
+        with self._lock:
+            if content_hash in self._entries:
+                return True
+        return os.path.exists(self._meta_path(content_hash))
+
+    # Yeni içerik için akış yazıcısı aç (bkz. CacheWriter)
+    def writer(self, content_hash):
+        return CacheWriter(self, content_hash)
+
+    # Önbellekteki metni tamamını belleğe almadan (sayfa_no, metin) kayıtları halinde oku
+    def iter_records(self, content_hash, block_chars=READ_BLOCK_CHARS):
+        with open(self._meta_path(content_hash), 'r', encoding='utf-8') as f:
+            page_offsets = json.load(f)['page_offsets']
+        page = 0
+        position = 0
+        with open(self._text_path(content_hash), 'r', encoding='utf-8', newline='') as f:
+            for block in iter(lambda: f.read(block_chars), ''):
+                block_start = 0
+                # Blok içindeki sayfa sınırlarında kaydı böl
+                while page < len(page_offsets) and page_offsets[page] < position + len(block):
+                    boundary = page_offsets[page] - position
+                    if boundary > block_start and page > 0:
+                        yield page, block[block_start:boundary]
+                    block_start = max(boundary, block_start)
+                    page += 1
+                yield max(page, 1), block[block_start:]
+                position += len(block)
+
+    # Metni ve sayfa konumlarını getir; önbellekte yoksa dosyayı bir kez ayrıştır
+    def get(self, file_path):
+        content_hash = self.content_hash(file_path)
+
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is not None:
+                self._entries.move_to_end(content_hash)
+                return entry
+
+        entry = self._load(content_hash)
+        if entry is None:
+            with self.writer(content_hash) as writer:
+                for page_no, text in iter_records(file_path):
+                    writer.write(page_no, text)
+            entry = self._load(content_hash)
+
+        self._remember(content_hash, entry)
+        return entry
+
+    def _load(self, content_hash):
+        meta_path = self._meta_path(content_hash)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._text_path(content_hash), 'r', encoding='utf-8', newline='') as f:
+                text = f.read()
+            return text, meta['page_offsets']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Önbellek okuma hatası ({content_hash}): {str(e)}")
+            return None
+
+    # Meta dosyası en son yazılır ve kaydın tamamlandığını gösterir
+    def _write_meta(self, content_hash, page_offsets):
+        meta_path = self._meta_path(content_hash)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'page_offsets': page_offsets, 'pages': len(page_offsets)}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _remember(self, content_hash, entry):
+        size = sys.getsizeof(entry[0])
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            if content_hash in self._entries:
+                self._entries.move_to_end(content_hash)
+                return
+            self._entries[content_hash] = entry
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                _, (old_text, _) = self._entries.popitem(last=False)
+                self._memory_bytes -= sys.getsizeof(old_text)
+
+    # Tüm önbelleği temizle
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self._path_hashes.clear()
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)